@@ -0,0 +1,41 @@
+# Headless analysis core shared by both apps, batch_analysis.py,
+# ingest_server.py and corpus_index.py, without UI dependencies. Importing the
+# package is cheap: the functions below are loaded with their module on first
+# access (PEP 562), scipy.fft, pandas and numba only when a function needs them.
+#
+#   from audio_core import load_wav, get_audio_params
+#   audio, sr = load_wav("speech.wav")
+#   params = get_audio_params(audio, sr, 512, 256, 0.008, 0.07, 0.015, 0.05)
+
+import importlib
+
+_EXPORTS = {
+    'audio_params': ['get_audio_params', 'get_frame_features', 'fill_f0', 'classify_frames', 'PARAMS_DTYPE'],
+    'clip_params': ['get_clip_params', 'clip_params_arrays', 'clip_params_from_arrays'],
+    'frequency_features': ['compute_frequency_features', 'compute_spectrogram', 'compute_cepstral_pitch',
+                           'compute_global_cepstrum', 'compute_fft', 'framed_spectrum', 'spectral_features',
+                           'stft_magnitude'],
+    'feature_graph': ['FeatureGraph'],
+    'feature_cache': ['FeatureCache', 'default_cache', 'get_cache', 'cached', 'content_digest', 'file_digest'],
+    'feature_index': ['FeatureIndex', 'summarize', 'summary_vector', 'VECTOR_FIELDS'],
+    'streaming': ['read_blocks', 'stream_audio_params', 'stream_clip_params', 'stream_frequency_features'],
+    'wav': ['load_wav', 'open_wav', 'find_files'],
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULES)
+
+
+def __getattr__(name):
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{module}"), name)
+    # later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_MODULES))
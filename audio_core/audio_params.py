@@ -0,0 +1,284 @@
+from functools import lru_cache
+import numpy as np
+from audio_core.parallel import chunk_ranges, map_chunks, resolve_workers, split_ranges
+from audio_core.profiling import profiled
+
+# number of frames transformed together, bounds the size of the FFT buffers
+BATCH_FRAMES = 4096
+
+# one record per frame, consumers read whole columns, e.g. params['volume']
+PARAMS_DTYPE = np.dtype([
+    ('time', np.float64),
+    ('ste', np.float32),
+    ('volume', np.float32),
+    ('zcr', np.float32),
+    ('silent_ratio', np.bool_),
+    ('voiced_ratio', np.bool_),
+    ('f0_autocorr', np.float32),
+    ('f0_amdf', np.float32),
+    ('f0_yin', np.float32),
+    ('yin_aperiodicity', np.float32),
+])
+
+F0_METHODS = ('autocorr', 'amdf', 'yin')
+
+@profiled()
+def get_audio_params(audio, sampling_rate, frame_size, frame_step, silence_vol_threshold, silence_zcr_threshold, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold=None, features=None, workers=1):
+    # workers > 1 shards the frames over a thread pool, the result is identical
+
+    if features is None:
+        features = get_frame_features(audio, sampling_rate, frame_size, frame_step, workers)
+
+    # YIN confidence decides voicing, so it has to run on every frame
+    if yin_threshold is not None:
+        fill_f0(features, audio, sampling_rate, frame_size, frame_step, methods=('yin',), workers=workers)
+
+    voiced = voiced_mask(features, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold)
+    fill_f0(features, audio, sampling_rate, frame_size, frame_step, mask=voiced, workers=workers)
+
+    return classify_frames(features, silence_vol_threshold, silence_zcr_threshold, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold)
+
+
+def get_frames(audio, frame_size, frame_step):
+    return np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::frame_step]
+
+
+@profiled()
+def get_frame_features(audio, sampling_rate, frame_size, frame_step, workers=1):
+    # threshold independent part of get_audio_params, F0 columns stay NaN
+    # until fill_f0 computes them
+    frames = get_frames(audio, frame_size, frame_step)
+
+    features = np.zeros(len(frames), dtype=PARAMS_DTYPE)
+    features['time'] = np.arange(len(frames)) * frame_step / sampling_rate
+
+    # every frame is reduced on its own, so any split of the frames gives the same values
+    def fill_shard(start, stop):
+        shard = frames[start:stop]
+        ste = features['ste'][start:stop]
+
+        # STE
+        ste[:] = np.sum(shard ** 2, axis=1) / frame_size
+
+        # volume
+        features['volume'][start:stop] = np.sqrt(ste)
+
+        # ZCR
+        features['zcr'][start:stop] = np.sum(np.abs(np.diff(np.sign(shard), axis=1)), axis=1) / frame_size
+
+    map_chunks(fill_shard, split_ranges(len(frames), resolve_workers(workers)), workers)
+
+    for method in F0_METHODS:
+        features['f0_' + method] = np.nan
+    features['yin_aperiodicity'] = np.nan
+
+    return features
+
+
+@profiled()
+def fill_f0(features, audio, sampling_rate, frame_size, frame_step, mask=None, methods=F0_METHODS, workers=1):
+    # computes F0 in place, only for masked frames that do not have it yet;
+    # every frame is estimated on its own, batches may run on several threads
+    frames = get_frames(audio, frame_size, frame_step)
+
+    min_lag = int(sampling_rate / 500)
+    max_lag = min(int(sampling_rate / 50), frame_size)
+    workers = resolve_workers(workers)
+
+    for method in methods:
+        column = features['f0_' + method]
+        pending = np.isnan(column)
+        if mask is not None:
+            pending &= mask
+        pending_idx = np.flatnonzero(pending)
+
+        batch_size = min(BATCH_FRAMES, max(-(-len(pending_idx) // workers), 1))
+
+        def fill_batch(start, stop):
+            idx = pending_idx[start:stop]
+            batch_frames = frames[idx]
+
+            # F0 YIN
+            if method == 'yin':
+                column[idx], features['yin_aperiodicity'][idx] = batch_yin(batch_frames, sampling_rate)
+
+            elif min_lag >= max_lag:
+                column[idx] = 0
+
+            # F0 autocorrelation
+            elif method == 'autocorr':
+                autocorr = batch_autocorr(batch_frames)
+                peak_idx = np.argmax(autocorr[:, min_lag:max_lag], axis=1) + min_lag
+                column[idx] = lag_to_f0(peak_idx, sampling_rate)
+
+            # F0 AMDF
+            elif method == 'amdf':
+                amdf = batch_amdf(batch_frames, min_lag, max_lag)
+                peak_idx = np.argmin(amdf, axis=1) + min_lag
+                column[idx] = lag_to_f0(peak_idx, sampling_rate)
+
+        map_chunks(fill_batch, chunk_ranges(len(pending_idx), batch_size), workers)
+
+
+def voiced_mask(features, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold=None):
+    if yin_threshold is not None:
+        return features['yin_aperiodicity'] < yin_threshold
+    return (features['volume'] > voiced_vol_threshold) & (features['zcr'] < voiced_zcr_threshold)
+
+
+@profiled()
+def classify_frames(features, silence_vol_threshold, silence_zcr_threshold, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold=None):
+    # cheap stage of get_audio_params, re-applies the thresholds to
+    # precomputed features, F0 must already be filled for voiced frames
+    params = features.copy()
+
+    # silent ratio
+    params['silent_ratio'] = (params['volume'] < silence_vol_threshold) & (params['zcr'] > silence_zcr_threshold)
+
+    # voiced phones ratio
+    params['voiced_ratio'] = voiced_mask(params, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold)
+
+    unvoiced = ~params['voiced_ratio']
+    for method in F0_METHODS:
+        params['f0_' + method][unvoiced] = 0
+    # without YIN voicing the aperiodicity is only measured for voiced frames,
+    # the others stay NaN even when the features hold a value for them
+    if yin_threshold is None:
+        params['yin_aperiodicity'][unvoiced] = np.nan
+
+    return params
+
+
+def lag_to_f0(peak_idx, sampling_rate):
+    peak_idx = np.asarray(peak_idx)
+    return np.where(peak_idx > 0, sampling_rate / np.maximum(peak_idx, 1), 0.0)
+
+
+def batch_autocorr(frames, normalize=True):
+    # autocorrelation of every row via the Wiener-Khinchin theorem, zero-padded
+    # to at least 2N - 1 so the circular correlation does not wrap around
+    frames = np.asarray(frames, dtype=np.float64)
+    N = frames.shape[-1]
+    n_fft = 1 << int(np.ceil(np.log2(max(2 * N - 1, 1))))
+
+    spectrum = np.fft.rfft(frames, n=n_fft, axis=-1)
+    autocorr = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, n=n_fft, axis=-1)[..., :N]
+
+    if normalize:
+        energy = autocorr[..., :1]
+        np.divide(autocorr, energy, out=autocorr, where=energy > 0)
+
+    return autocorr
+
+
+def autocorr_function(frame):
+    return batch_autocorr(frame)
+
+def batch_yin(frames, sampling_rate, f0_min=50, f0_max=500, threshold=0.1):
+    # YIN pitch estimate of every row, returns (f0, aperiodicity)
+    frames = np.asarray(frames, dtype=np.float64)
+    if frames.ndim == 1:
+        f0, aperiodicity = batch_yin(frames[np.newaxis], sampling_rate, f0_min, f0_max, threshold)
+        return f0[0], aperiodicity[0]
+
+    n_frames, N = frames.shape
+    min_lag = max(int(sampling_rate / f0_max), 1)
+    max_lag = min(int(sampling_rate / f0_min), N - 1)
+    if n_frames == 0 or max_lag <= min_lag:
+        return np.zeros(n_frames), np.ones(n_frames)
+
+    # difference function d(tau) = sum (x[j] - x[j + tau])^2 over j < N - tau,
+    # expanded into two energy terms and the FFT autocorrelation
+    energy = np.zeros((n_frames, N + 1))
+    np.cumsum(frames ** 2, axis=1, out=energy[:, 1:])
+    lags = np.arange(max_lag + 1)
+    autocorr = batch_autocorr(frames, normalize=False)[:, :max_lag + 1]
+    diff = energy[:, N - lags] + energy[:, N:] - energy[:, lags] - 2 * autocorr
+
+    # cumulative mean normalized difference
+    cmnd = np.ones_like(diff)
+    running_sum = np.cumsum(diff[:, 1:], axis=1)
+    np.divide(diff[:, 1:] * lags[1:], running_sum, out=cmnd[:, 1:], where=running_sum > 0)
+
+    # first dip under the threshold, followed down to its local minimum;
+    # frames without one fall back to the global minimum of the search range
+    search = cmnd[:, min_lag:max_lag]
+    below = search < threshold
+    has_dip = below.any(axis=1)
+    first = np.argmax(below, axis=1)
+    cols = np.arange(search.shape[1])
+    rising = np.append(search[:, 1:] >= search[:, :-1], np.ones((n_frames, 1), dtype=bool), axis=1)
+    local_min = np.argmax(rising & (cols >= first[:, np.newaxis]), axis=1)
+    best = np.where(has_dip, local_min, np.argmin(search, axis=1)) + min_lag
+
+    # parabolic interpolation around the chosen lag
+    rows = np.arange(n_frames)
+    left, mid, right = cmnd[rows, best - 1], cmnd[rows, best], cmnd[rows, best + 1]
+    denom = left - 2 * mid + right
+    shift = np.zeros(n_frames)
+    np.divide(0.5 * (left - right), denom, out=shift, where=denom > 0)
+    period = best + np.clip(shift, -0.5, 0.5)
+
+    f0 = sampling_rate / period
+    aperiodicity = np.clip(mid, 0, 1)
+
+    return f0, aperiodicity
+
+
+def batch_amdf(frames, min_lag, max_lag, use_jit=True):
+    # AMDF of every row, evaluated only for lags in [min_lag, max_lag)
+    frames = np.ascontiguousarray(frames, dtype=np.float64)
+    if frames.ndim == 1:
+        return batch_amdf(frames[np.newaxis], min_lag, max_lag, use_jit)[0]
+
+    max_lag = min(max_lag, frames.shape[1])
+    if max_lag <= min_lag:
+        return np.zeros((len(frames), 0))
+
+    kernel = _amdf_kernel() if use_jit else None
+    if kernel is not None:
+        return kernel(frames, min_lag, max_lag)
+    return _amdf_numpy(frames, min_lag, max_lag)
+
+
+def _amdf_numpy(frames, min_lag, max_lag):
+    N = frames.shape[1]
+    amdf = np.empty((len(frames), max_lag - min_lag))
+
+    for col, lag in enumerate(range(min_lag, max_lag)):
+        amdf[:, col] = np.mean(np.abs(frames[:, lag:] - frames[:, :N - lag]), axis=1)
+
+    return amdf
+
+
+def _amdf_loops(frames, min_lag, max_lag):
+    n_frames, N = frames.shape
+    amdf = np.empty((n_frames, max_lag - min_lag))
+
+    for f in range(n_frames):
+        for lag in range(min_lag, max_lag):
+            sum_diff = 0.0
+            for i in range(N - lag):
+                sum_diff += abs(frames[f, i] - frames[f, i + lag])
+            amdf[f, lag - min_lag] = sum_diff / (N - lag)
+
+    return amdf
+
+
+@lru_cache(maxsize=None)
+def _amdf_kernel():
+    # numba is only imported (and the kernel compiled) on the first AMDF call,
+    # None without numba; nogil, so batches of the thread pool run it in parallel
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True, nogil=True)(_amdf_loops)
+
+
+def amdf_function(frame):
+    N = len(frame)
+    amdf = np.zeros(N)
+    amdf[1:] = batch_amdf(frame, 1, N)
+
+    return amdf
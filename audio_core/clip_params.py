@@ -0,0 +1,178 @@
+import numpy as np
+from audio_core.parallel import chunk_ranges, map_chunks
+from audio_core.profiling import profiled
+
+CLIP_COLUMNS = ["Type", "VSTD", "VDR", "VU", "LSTER", "Energy Entropy", "ZSTD", "HZCRR"]
+
+# frames / clips reduced together, bounds the temporary arrays
+BATCH_FRAMES = 4096
+BATCH_CLIPS = 64
+
+@profiled()
+def get_clip_params(audio, sampling_rate, frame_size, frame_step, clip_length=1, workers=1):
+    # workers > 1 runs the frame and clip batches on a thread pool, the result is identical
+
+    if frame_size > len(audio):
+        frame_size = len(audio)
+
+    clip_size = int(round(clip_length * sampling_rate))
+    num_clips = int(np.ceil(len(audio) / clip_size))
+
+    frame_ste, frame_zcr = frame_energy_zcr(audio, frame_size, frame_step, workers)
+
+    # frames of clip i are frames[bounds[i]:bounds[i + 1]]
+    bounds = np.minimum(np.arange(num_clips + 1) * clip_size // frame_step, len(frame_ste))
+
+    columns = clip_columns(audio, clip_size, frame_ste, frame_zcr, bounds, workers)
+
+    return clip_params_frame(columns, clip_length=clip_length)
+
+
+def frame_energy_zcr(audio, frame_size, frame_step, workers=1):
+    # STE and ZCR of every frame from running sums over the samples, so each
+    # sample is squared and sign-compared once no matter how frames overlap;
+    # the sums restart every BATCH_FRAMES frames, the batches are independent
+    n_frames = (len(audio) - frame_size) // frame_step + 1 if len(audio) >= frame_size else 0
+    ste = np.empty(n_frames)
+    zcr = np.empty(n_frames)
+
+    def fill_batch(start, stop):
+        segment = audio[start * frame_step:(stop - 1) * frame_step + frame_size]
+        offsets = np.arange(stop - start) * frame_step
+
+        energy = np.concatenate([[0], np.cumsum(segment.astype(np.float64)**2)])
+        ste[start:stop] = (energy[offsets + frame_size] - energy[offsets]) / frame_size
+
+        crossings = np.concatenate([[0], np.cumsum(np.diff(np.sign(segment)) != 0, dtype=np.int32)])
+        zcr[start:stop] = (crossings[offsets + frame_size - 1] - crossings[offsets]) / (frame_size * 2)
+
+    map_chunks(fill_batch, chunk_ranges(n_frames, BATCH_FRAMES), workers)
+
+    return ste, zcr
+
+
+def clip_columns(audio, clip_size, frame_ste, frame_zcr, bounds, workers=1):
+    # all clip parameters for consecutive clips of clip_size samples (the last
+    # one may be shorter), frame values are grouped into clips by bounds
+    num_clips = len(bounds) - 1
+    num_full = len(audio) // clip_size
+
+    vstd = np.zeros(num_clips)
+    vdr = np.zeros(num_clips)
+    vu = np.zeros(num_clips)
+    energy_entropy = np.zeros(num_clips)
+
+    def fill_batch(start, stop):
+        clips = audio[start * clip_size:stop * clip_size].reshape(stop - start, clip_size)
+        vstd[start:stop], vdr[start:stop], vu[start:stop], energy_entropy[start:stop] = _sample_stats(clips)
+
+    map_chunks(fill_batch, chunk_ranges(num_full, BATCH_CLIPS), workers)
+
+    if num_full < num_clips:
+        clips = audio[num_full * clip_size:][np.newaxis]
+        vstd[num_full:], vdr[num_full:], vu[num_full:], energy_entropy[num_full:] = _sample_stats(clips)
+
+    # frame parameters, per clip sums over the frame ranges
+    counts = np.diff(bounds)
+    clip_of_frame = np.repeat(np.arange(num_clips), counts)[:len(frame_ste)]
+    frame_ste = frame_ste[:len(clip_of_frame)]
+    frame_zcr = frame_zcr[:len(clip_of_frame)]
+    divisor = np.maximum(counts, 1)
+
+    # LSTER
+    avg_ste = _range_sum(frame_ste, bounds) / divisor
+    low_energy = _range_sum(frame_ste < 0.5 * avg_ste[clip_of_frame], bounds)
+    lster = np.where(avg_ste > 0, low_energy / divisor, 0)
+
+    # ZSTD
+    avg_zcr = _range_sum(frame_zcr, bounds) / divisor
+    zcr_var = _range_sum((frame_zcr - avg_zcr[clip_of_frame])**2, bounds) / divisor
+    zstd = np.where(counts > 1, np.sqrt(zcr_var), 0)
+
+    # HZCRR
+    high_zcr = _range_sum(frame_zcr > 1.5 * avg_zcr[clip_of_frame], bounds)
+    hzcrr = np.where(counts > 0, high_zcr / divisor, 0)
+
+    # type
+    clip_type = np.select([(lster > 0.3) & (zstd > 0.01), (lster < 0.3) & (zstd < 0.01)], ["Speech", "Music"], "Unknown")
+
+    return {
+        "Type": clip_type,
+        "VSTD": vstd,
+        "VDR": vdr,
+        "VU": vu,
+        "LSTER": lster,
+        "Energy Entropy": energy_entropy,
+        "ZSTD": zstd,
+        "HZCRR": hzcrr,
+    }
+
+
+def _sample_stats(clips):
+    # VSTD, VDR, VU and energy entropy of equally long clips, one per row
+    clip_len = clips.shape[1]
+
+    # VSTD
+    mean = np.mean(clips, axis=1)
+    std = np.std(clips, axis=1)
+    vstd = np.divide(std, mean, out=np.zeros(len(clips)), where=mean != 0)
+
+    # VDR
+    max_val = np.max(clips, axis=1)
+    min_val = np.min(clips, axis=1)
+    vdr = np.divide(max_val - min_val, max_val, out=np.zeros(len(clips)), where=max_val != 0)
+
+    # VU
+    vu = np.mean(np.abs(clips), axis=1)
+
+    # Energy Entropy, segments start at range(0, clip_len - segment_size, segment_size)
+    segment_size = max(1, clip_len // 10)
+    num_segments = len(range(0, clip_len - segment_size, segment_size))
+    segments = clips[:, :num_segments * segment_size].reshape(len(clips), num_segments, segment_size)
+    energy_segments = np.sum(segments**2, axis=2)
+    total_energy = np.sum(energy_segments, axis=1, keepdims=True)
+
+    normalized_energy = np.divide(energy_segments, total_energy, out=np.zeros(energy_segments.shape), where=total_energy > 0)
+    energy_entropy = -np.sum(normalized_energy * np.log2(normalized_energy + 1e-10), axis=1)
+    energy_entropy[total_energy[:, 0] <= 0] = 0
+
+    return vstd, vdr, vu, energy_entropy
+
+
+def _range_sum(values, bounds):
+    cumulative = np.concatenate([[0], np.cumsum(values, dtype=np.float64)])
+    return cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+
+
+def clip_row(clip, frames_audio, frame_size, frame_step):
+    # parameters of a single clip, used by the streaming path, frames_audio
+    # holds the samples covered by the clip's frames
+    frame_ste, frame_zcr = frame_energy_zcr(frames_audio, frame_size, frame_step)
+    columns = clip_columns(clip, len(clip), frame_ste, frame_zcr, np.array([0, len(frame_ste)]))
+
+    return [columns[column][0] for column in CLIP_COLUMNS]
+
+
+def clip_params_frame(params_per_second, first_second=0, clip_length=1):
+    # pandas is only needed for the table itself
+    import pandas as pd
+
+    # dataframe
+    df = pd.DataFrame(params_per_second, columns=CLIP_COLUMNS)
+    df = df.round(3)
+    df.index = [f"{(i+1) * clip_length:g}s" for i in range(first_second, first_second + df.shape[0])]
+
+    return df
+
+
+def clip_params_arrays(df):
+    # plain arrays of the table, e.g. for audio_core.feature_cache
+    arrays = {column: df[column].to_numpy(dtype=str if column == "Type" else float) for column in CLIP_COLUMNS}
+    arrays["index"] = df.index.to_numpy(dtype=str)
+    return arrays
+
+
+def clip_params_from_arrays(arrays):
+    import pandas as pd
+
+    return pd.DataFrame({column: arrays[column] for column in CLIP_COLUMNS}, index=arrays["index"].tolist())
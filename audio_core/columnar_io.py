@@ -0,0 +1,163 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+import zipfile
+import numpy as np
+
+# Writers for tables given as {column name: 1-D array}. Rows are converted and
+# written chunk by chunk, run metadata is stored once: as "# key: value" lines
+# above the CSV header (read back with pd.read_csv(..., comment='#')), as the
+# TXT header, as a JSON "__metadata__" entry of the NPZ file and in the
+# Parquet schema metadata. Tables longer than ROWS_PER_FILE are split into
+# parts, self-contained files of their own (written to a directory, or one ZIP
+# archive for a download). pyarrow is optional and only imported by the
+# Parquet writer.
+
+# rows converted and written at once
+CHUNK_ROWS = 65536
+
+# longer exports are split into parts, about 1.6 hours of 512/256 frames at 44.1 kHz
+ROWS_PER_FILE = 1_000_000
+
+# format -> MIME type
+FORMATS = {
+    'csv': 'text/csv',
+    'txt': 'text/plain',
+    'npz': 'application/octet-stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != 'parquet' or importlib.util.find_spec('pyarrow') is not None]
+
+
+def iter_chunks(columns, chunk_rows=CHUNK_ROWS):
+    n_rows = table_rows(columns)
+    for start in range(0, n_rows, chunk_rows):
+        yield {name: np.asarray(values)[start:start + chunk_rows] for name, values in columns.items()}
+
+
+def write_csv(stream, columns, metadata=None, chunk_rows=CHUNK_ROWS, sep=';'):
+    # stream is a text stream
+    for key, value in (metadata or {}).items():
+        stream.write(f"# {key}: {value}\n")
+
+    writer = csv.writer(stream, delimiter=sep, lineterminator='\n')
+    writer.writerow(columns.keys())
+    for chunk in iter_chunks(columns, chunk_rows):
+        writer.writerows(zip(*(values.astype(str) for values in chunk.values())))
+
+
+def write_txt(stream, columns, metadata=None, chunk_rows=CHUNK_ROWS, row_label='Frame', first_row=1):
+    # one indented "name: value" block per row, stream is a text stream
+    for key, value in (metadata or {}).items():
+        stream.write(f"{key}: {value}\n")
+
+    names = list(columns)
+    row = first_row
+    for chunk in iter_chunks(columns, chunk_rows):
+        lines = []
+        for values in zip(*(values.astype(str) for values in chunk.values())):
+            lines.append(f"\n{row_label} {row}:\n")
+            lines.extend(f"  {name}: {value}\n" for name, value in zip(names, values))
+            row += 1
+        stream.write(''.join(lines))
+
+
+def write_npz(file, columns, metadata=None):
+    np.savez_compressed(file, **columns, __metadata__=np.array(json.dumps(metadata or {})))
+
+
+def write_parquet(file, columns, metadata=None, chunk_rows=CHUNK_ROWS):
+    # every chunk becomes a row group
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required for Parquet export")
+
+    schema = pa.table({name: np.asarray(values)[:0] for name, values in columns.items()}).schema
+    schema = schema.with_metadata({'metadata': json.dumps(metadata or {})})
+
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in iter_chunks(columns, chunk_rows):
+            writer.write_table(pa.table(chunk, schema=schema))
+
+
+def write_table(file, columns, metadata=None, fmt='csv', chunk_rows=CHUNK_ROWS, **options):
+    # file is a path or a binary stream
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    if fmt == 'npz':
+        write_npz(file, columns, metadata)
+    elif fmt == 'parquet':
+        write_parquet(file, columns, metadata, chunk_rows)
+    else:
+        write_text = write_csv if fmt == 'csv' else write_txt
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, 'w', encoding='utf-8', newline='') as stream:
+                write_text(stream, columns, metadata, chunk_rows, **options)
+        else:
+            stream = io.TextIOWrapper(file, encoding='utf-8', newline='')
+            write_text(stream, columns, metadata, chunk_rows, **options)
+            stream.flush()
+            stream.detach()
+
+
+def table_bytes(columns, metadata=None, fmt='csv', **options):
+    buffer = io.BytesIO()
+    write_table(buffer, columns, metadata, fmt, **options)
+    return buffer.getvalue()
+
+
+def iter_parts(stem, columns, metadata=None, fmt='csv', rows_per_file=ROWS_PER_FILE, **options):
+    # (file name, encoded part) of stem.part000.<fmt>, stem.part001.<fmt>, ...
+    # each part is a complete file with the metadata and its first row
+    for part, chunk in enumerate(iter_chunks(columns, rows_per_file)):
+        # rows are numbered from 1 like the Frame columns, TXT keeps counting across the parts
+        first_row = part * rows_per_file + 1
+        part_metadata = dict(metadata or {}, **{"First Row": first_row})
+        part_options = dict(options, first_row=first_row) if fmt == 'txt' else options
+        yield f"{stem}.part{part:03d}.{fmt}", table_bytes(chunk, part_metadata, fmt, **part_options)
+
+
+def write_parts(directory, stem, columns, metadata=None, fmt='csv', rows_per_file=ROWS_PER_FILE, **options):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+
+    for name, data in iter_parts(stem, columns, metadata, fmt, rows_per_file, **options):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        paths.append(path)
+
+    return paths
+
+
+def table_rows(columns):
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+def download_name(stem, fmt, n_rows, rows_per_file=ROWS_PER_FILE):
+    # file name and MIME type of what export_bytes returns for n_rows rows
+    if n_rows > rows_per_file:
+        return f"{stem}.{fmt}.zip", 'application/zip'
+    return f"{stem}.{fmt}", FORMATS[fmt]
+
+
+def export_bytes(stem, columns, metadata=None, fmt='csv', rows_per_file=ROWS_PER_FILE, **options):
+    # the encoded table, or a ZIP archive of its parts when it is longer than
+    # rows_per_file; download_name gives the matching file name
+    if table_rows(columns) <= rows_per_file:
+        return table_bytes(columns, metadata, fmt, **options)
+
+    buffer = io.BytesIO()
+    # NPZ and Parquet parts are compressed already
+    compression = zipfile.ZIP_DEFLATED if fmt in ('csv', 'txt') else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, data in iter_parts(stem, columns, metadata, fmt, rows_per_file, **options):
+            archive.writestr(name, data)
+    return buffer.getvalue()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+import numpy as np
+
+# Persistent cache of analysis results, shared by the apps and the batch
+# runner. Entries are addressed by the SHA-256 of the audio file plus the
+# analysis parameters and stored as uncompressed .npz files (no pickles):
+#
+#   cache = FeatureCache("~/.cache/audio_analysis", max_bytes=2**30)
+#   digest = file_digest("speech.wav")
+#   features = cache.fetch('frequency_features', digest, {'frame_size': 512, 'frame_step': 256},
+#                          lambda: compute_frequency_features(audio, sr, 512, 256))
+#
+# Values are single arrays, tuples or dicts of arrays. Writes go to a temporary
+# file that is renamed into place, so readers (other sessions, other batch
+# processes) never see a partial entry. Every hit refreshes the file mtime and
+# the oldest entries are deleted once the directory grows over max_bytes.
+
+# part of every key, bump when a cached function changes its results
+CACHE_VERSION = 3
+
+DEFAULT_DIR = os.path.join("~", ".cache", "audio_analysis", "features")
+DEFAULT_MAX_BYTES = 2 * 2**30
+
+# eviction makes room down to this fraction of max_bytes, so that not every
+# store of a full cache has to scan the directory
+LOW_WATER = 0.9
+
+# temporary files of writers that died are removed after this many seconds
+STALE_TMP_SECONDS = 3600
+
+_LAYOUT = '__layout__'
+
+
+def content_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+
+def pack(value):
+    # named arrays of a result plus the layout needed to rebuild it
+    if isinstance(value, dict):
+        arrays = {f"k{i}": np.asarray(v) for i, v in enumerate(value.values())}
+        layout = {'type': 'dict', 'keys': list(value)}
+    elif isinstance(value, tuple):
+        arrays = {f"k{i}": np.asarray(v) for i, v in enumerate(value)}
+        layout = {'type': 'tuple', 'size': len(value)}
+    else:
+        arrays = {'k0': np.asarray(value)}
+        layout = {'type': 'array'}
+
+    arrays[_LAYOUT] = np.array(json.dumps(layout))
+    return arrays
+
+
+def unpack(arrays):
+    layout = json.loads(str(arrays[_LAYOUT]))
+    # cached results are shared like the in-memory caches, nobody may modify them
+    values = []
+    for i in range(len(arrays) - 1):
+        array = arrays[f"k{i}"]
+        array.setflags(write=False)
+        values.append(array)
+
+    if layout['type'] == 'dict':
+        return dict(zip(layout['keys'], values))
+    if layout['type'] == 'tuple':
+        return tuple(values)
+    return values[0]
+
+
+class FeatureCache:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # bytes in the directory, counted by every scan; writes of other
+        # processes are only noticed by the next one
+        self._size = 0
+        # a lowered cap applies right away
+        self.evict()
+
+    def path(self, kind, audio_digest, params):
+        key = json.dumps({'version': CACHE_VERSION, 'kind': kind, 'audio': audio_digest, 'params': params},
+                         sort_keys=True, default=str)
+        return os.path.join(self.directory, f"{kind}-{hashlib.sha256(key.encode()).hexdigest()}.npz")
+
+    def load(self, kind, audio_digest, params):
+        # the cached value, None when there is none
+        path = self.path(kind, audio_digest, params)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                value = unpack({name: entry[name] for name in entry.files})
+            # touched for the LRU order
+            os.utime(path)
+        except OSError:
+            # missing, evicted meanwhile or unreadable
+            self.misses += 1
+            return None
+        except (ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # truncated or corrupted, fetch computes and stores it again
+            _remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def store(self, kind, audio_digest, params, value):
+        path = self.path(kind, audio_digest, params)
+        # a replaced entry no longer counts
+        try:
+            replaced_size = os.path.getsize(path)
+        except OSError:
+            replaced_size = 0
+
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **pack(value))
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+        with self.lock:
+            self._size += os.path.getsize(path) - replaced_size
+            if self._size > self.max_bytes:
+                self.evict(keep=path, target=int(self.max_bytes * LOW_WATER))
+
+    def fetch(self, kind, audio_digest, params, compute):
+        # cached value, or compute() stored for the next time
+        value = self.load(kind, audio_digest, params)
+        if value is None:
+            value = compute()
+            try:
+                self.store(kind, audio_digest, params, value)
+            except OSError:
+                # a full disk only costs the next run the computation
+                pass
+        return value
+
+    def evict(self, keep=None, target=None):
+        # deletes least recently used entries until the directory fits into
+        # target bytes (default max_bytes)
+        target = self.max_bytes if target is None else target
+        entries = []
+        now = time.time()
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if entry.name.endswith(".tmp"):
+                if now - stat.st_mtime > STALE_TMP_SECONDS:
+                    _remove(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= target:
+                break
+            if path != keep:
+                _remove(path)
+                size -= entry_size
+
+        self._size = size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npz"):
+                _remove(entry.path)
+        self._size = 0
+
+
+def _remove(path):
+    # other processes evict from the same directory
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# one FeatureCache per directory and size cap in every process, e.g. in the
+# workers of a process pool
+_shared = {}
+_shared_lock = threading.Lock()
+
+def get_cache(directory, max_bytes=DEFAULT_MAX_BYTES):
+    # None for directory None (caching disabled)
+    if directory is None:
+        return None
+    key = (os.path.expanduser(directory), max_bytes)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = FeatureCache(directory, max_bytes)
+        return _shared[key]
+
+
+def cached(cache, kind, audio_digest, params, compute):
+    # cache.fetch, or compute() when there is no cache
+    if cache is None:
+        return compute()
+    return cache.fetch(kind, audio_digest, params, compute)
+
+
+def default_cache():
+    # configured by AUDIO_FEATURE_CACHE (directory, "off" disables it) and
+    # AUDIO_FEATURE_CACHE_MB (size cap)
+    directory = os.environ.get('AUDIO_FEATURE_CACHE', DEFAULT_DIR)
+    if directory.lower() in ('', 'off', '0'):
+        return None
+
+    max_mb = os.environ.get('AUDIO_FEATURE_CACHE_MB')
+    max_bytes = int(float(max_mb) * 2**20) if max_mb else DEFAULT_MAX_BYTES
+    try:
+        return FeatureCache(directory, max_bytes)
+    except OSError:
+        # e.g. a read-only home directory, the analyses still work without it
+        return None
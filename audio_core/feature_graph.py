@@ -0,0 +1,165 @@
+import threading
+from collections import Counter, OrderedDict
+from audio_core.profiling import stage
+from audio_core.frequency_features import (cepstral_band, compute_cepstral_pitch, compute_frequency_features,
+                                           compute_global_cepstrum, framed_spectrum, spectrogram_shape)
+
+# The frequency analyses of one signal, memoized by their parameters so that
+# the sections of the app and later reruns share them:
+#
+#   spectrum(frame_size, frame_step, window_type)     |rFFT| of the windowed frames
+#   frequency_features(frame_size, frame_step)        compute_frequency_features
+#   pitch(frame_size, frame_step, f0_min, f0_max)     compute_cepstral_pitch
+#   global_cepstrum(mode, frame_size)                 whole signal or Welch averaged cepstrum
+#
+# The first three come from one framed_spectrum pass per framing. The hann
+# spectrum pass also reduces every batch to the spectral features of the
+# framing, and the features and pitch nodes reduce the columns of the kept
+# hann spectrum instead of transforming the frames again. A spectrum that
+# would take more than half of max_bytes is not kept, then the features and
+# the pitch each run their own pass, which drops every batch once its
+# per-frame results are computed.
+#
+#   graph = FeatureGraph(audio, sr)
+#   freqs, times, spec = graph.get('spectrum', frame_size=512, frame_step=256, window_type='hann')
+#
+# The memoized results are bounded by their size, not their number: the least
+# recently used ones are dropped once the graph holds more than max_bytes, and
+# a result larger than max_bytes on its own is returned without being kept.
+# The single segment FFTs of the FFT panel are not nodes, a whole-file
+# spectrum per slider position would fill the budget at once.
+#
+# With a disk_cache (audio_core.feature_cache) the persistent nodes are also
+# kept on disk under the digest of the audio file, across reruns and restarts.
+# frequency_features and pitch use the kinds and parameters of batch_analysis.py,
+# so the entries are shared with the batch runner.
+
+NODES = {}
+# nodes worth storing on disk, the others are cheap or derived from them
+PERSISTENT = set()
+
+# per graph, the app keeps one graph per recent upload
+DEFAULT_MAX_BYTES = 128 * 2**20
+
+def value_bytes(value):
+    # memory held by the arrays of a node result
+    if isinstance(value, dict):
+        return sum(value_bytes(item) for item in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(value_bytes(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+def node(name, persist=False):
+    def register(compute):
+        NODES[name] = compute
+        if persist:
+            PERSISTENT.add(name)
+        return compute
+    return register
+
+
+class FeatureGraph:
+    def __init__(self, audio, sampling_rate, max_bytes=DEFAULT_MAX_BYTES, disk_cache=None, audio_digest=None):
+        self.audio = audio
+        self.sampling_rate = sampling_rate
+        self.max_bytes = max_bytes
+        self.disk_cache = disk_cache if audio_digest is not None else None
+        self.audio_digest = audio_digest
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        # evaluations per node, i.e. cache misses
+        self.computed = Counter()
+        # one graph may be shared by several sessions, nodes call get recursively
+        self.lock = threading.RLock()
+
+    def get(self, name, **params):
+        key = node_key(name, params)
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+            with stage(f"graph: {name}"):
+                if self.disk_cache is not None and name in PERSISTENT:
+                    value = self.disk_cache.fetch(name, self.audio_digest, params, lambda: NODES[name](self, **params))
+                else:
+                    value = NODES[name](self, **params)
+            self.computed[name] += 1
+
+            self.keep(key, value)
+
+            return value
+
+    def peek(self, name, **params):
+        # the memoized result, None without computing it
+        with self.lock:
+            return self.cache.get(node_key(name, params))
+
+    def keeps_spectrum(self, frame_size, frame_step):
+        n_bins, num_frames = spectrogram_shape(len(self.audio), frame_size, frame_step)
+        return n_bins * num_frames * 4 <= self.max_bytes // 2
+
+    def keep(self, key, value):
+        # a result stored by another node is replaced
+        if key in self.cache:
+            self.cached_bytes -= value_bytes(self.cache.pop(key))
+        size = value_bytes(value)
+        if size > self.max_bytes:
+            return
+        # least recently used results are dropped first
+        self.cache[key] = value
+        self.cached_bytes += size
+        while self.cached_bytes > self.max_bytes:
+            _, dropped = self.cache.popitem(last=False)
+            self.cached_bytes -= value_bytes(dropped)
+
+
+def node_key(name, params):
+    return name, tuple(sorted(params.items()))
+
+
+@node('spectrum', persist=True)
+def _spectrum(graph, frame_size, frame_step, window_type):
+    with_features = window_type == 'hann'
+    result = framed_spectrum(graph.audio, graph.sampling_rate, frame_size, frame_step, window_type,
+                             magnitude=True, features=with_features)
+    if with_features:
+        graph.keep(node_key('frequency_features', {'frame_size': frame_size, 'frame_step': frame_step}),
+                   result['features'])
+    # shared by every consumer of the node
+    magnitude = result['magnitude']
+    magnitude.setflags(write=False)
+    return result['freqs'], result['times'], magnitude
+
+
+@node('frequency_features', persist=True)
+def _frequency_features(graph, frame_size, frame_step):
+    # centered periodic hann frames, the same table as the batch runner, the
+    # corpus index and the ingest server
+    if not graph.keeps_spectrum(frame_size, frame_step):
+        return compute_frequency_features(graph.audio, graph.sampling_rate, frame_size, frame_step)
+
+    _, _, magnitude = graph.get('spectrum', frame_size=frame_size, frame_step=frame_step, window_type='hann')
+    # stored by the spectrum pass, unless the spectrum came from the disk cache
+    features = graph.peek('frequency_features', frame_size=frame_size, frame_step=frame_step)
+    if features is None:
+        features = framed_spectrum(None, graph.sampling_rate, frame_size, frame_step, features=True,
+                                   precomputed=magnitude)['features']
+    return features
+
+
+@node('pitch', persist=True)
+def _pitch(graph, frame_size, frame_step, f0_min, f0_max):
+    if not graph.keeps_spectrum(frame_size, frame_step):
+        return compute_cepstral_pitch(graph.audio, graph.sampling_rate, frame_size, frame_step, f0_min, f0_max)
+
+    _, _, magnitude = graph.get('spectrum', frame_size=frame_size, frame_step=frame_step, window_type='hann')
+    band = cepstral_band(graph.sampling_rate, frame_size, f0_min, f0_max)
+    result = framed_spectrum(None, graph.sampling_rate, frame_size, frame_step, pitch_band=band, precomputed=magnitude)
+    return result['times'], result['f0'], result['prominence']
+
+
+@node('global_cepstrum', persist=True)
+def _global_cepstrum(graph, mode, frame_size):
+    return compute_global_cepstrum(graph.audio, graph.sampling_rate, mode, frame_size)
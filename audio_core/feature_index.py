@@ -0,0 +1,271 @@
+import json
+import os
+import numpy as np
+from audio_core.audio_params import get_audio_params
+from audio_core.clip_params import CLIP_COLUMNS, clip_params_arrays, get_clip_params
+from audio_core.frequency_features import compute_frequency_features
+
+# Similarity index of whole recordings. Every file is summarized into a fixed
+# length vector (clip parameter statistics, F0 distribution, spectral feature
+# statistics), the vectors live in a memory-mapped float32 matrix on disk:
+#
+#   with FeatureIndex("corpus_index") as index:
+#       index.add(["jeden_1.wav"], [summarize(audio, sr)])
+#       ids, distances = index.query_ids(["jeden_1.wav"], k=3)
+#
+# <directory>/vectors.f32  rows x dim matrix, grows by doubling, rows are never moved
+# <directory>/index.json   id of every row (null for removed rows), column sums
+#                          and the summarize() parameters of the vectors
+#
+# Removing an id only clears its row, later adds reuse it, so neither adding
+# nor removing rebuilds anything. Distances are euclidean between z-scored
+# vectors, the mean and deviation come from column sums kept up to date by
+# add/remove. One process may write an index at a time; changes reach the disk
+# on flush() or when the with block ends.
+
+CLIP_STATS = [column for column in CLIP_COLUMNS if column != "Type"]
+CLIP_TYPES = ["Speech", "Music", "Unknown"]
+F0_STATS = ["voiced ratio", "silent ratio", "F0 p10", "F0 p50", "F0 p90", "F0 mean", "F0 std"]
+SPECTRAL_STATS = ["Frequency Centroid", "Bandwidth", "ERSB1", "ERSB2", "ERSB3", "Spectral Flatness", "Spectral Crest"]
+
+VECTOR_FIELDS = ([f"{column} {stat}" for column in CLIP_STATS for stat in ("mean", "std")]
+                 + [f"{clip_type} clips" for clip_type in CLIP_TYPES]
+                 + F0_STATS
+                 + [f"{feature} {stat}" for feature in SPECTRAL_STATS for stat in ("mean", "std")])
+
+# stored rows compared with the queries at once, bounds the distance matrix
+BATCH_ROWS = 8192
+INITIAL_CAPACITY = 64
+
+
+def summarize(audio, sampling_rate, frame_size=512, frame_step=256, silence_vol_threshold=0.008, silence_zcr_threshold=0.07, voiced_vol_threshold=0.015, voiced_zcr_threshold=0.05, f0_method='yin'):
+    params = get_audio_params(audio,
+                              sampling_rate,
+                              frame_size,
+                              frame_step,
+                              silence_vol_threshold,
+                              silence_zcr_threshold,
+                              voiced_vol_threshold,
+                              voiced_zcr_threshold)
+    clips = clip_params_arrays(get_clip_params(audio, sampling_rate, frame_size, frame_step))
+    spectral = compute_frequency_features(audio, sampling_rate, frame_size, frame_step)
+
+    return summary_vector(params, clips, spectral, f0_method)
+
+
+def summary_vector(params, clips, spectral, f0_method='yin'):
+    # fixed length vector (VECTOR_FIELDS) from the get_audio_params array, the
+    # clip_params_arrays columns and the compute_frequency_features dict
+    vector = []
+
+    for column in CLIP_STATS:
+        vector += _mean_std(clips[column])
+    vector += [np.mean(clips["Type"] == clip_type) if len(clips["Type"]) else 0.0 for clip_type in CLIP_TYPES]
+
+    voiced = params['voiced_ratio']
+    f0 = params['f0_' + f0_method][voiced]
+    vector += [np.mean(voiced) if len(voiced) else 0.0, np.mean(params['silent_ratio']) if len(voiced) else 0.0]
+    vector += list(np.percentile(f0, [10, 50, 90])) if len(f0) else [0.0, 0.0, 0.0]
+    vector += _mean_std(f0)
+
+    for feature in SPECTRAL_STATS:
+        vector += _mean_std(spectral[feature])
+
+    return np.nan_to_num(np.array(vector, dtype=np.float64)).astype(np.float32)
+
+
+def _mean_std(values):
+    if len(values) == 0:
+        return [0.0, 0.0]
+    return [np.mean(values), np.std(values)]
+
+
+class FeatureIndex:
+    def __init__(self, directory, fields=VECTOR_FIELDS, params=None):
+        # params (e.g. frame_size, frame_step) only apply to a new index, an
+        # existing one keeps the recorded ones; vectors of other parameters
+        # are not comparable with the stored ones
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "index.json")
+
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            self.fields = meta['fields']
+            # indexes written before the parameters were recorded have none
+            self.params = meta.get('params', {})
+            self.ids = meta['ids']
+            self.sums = np.array(meta['sums'], dtype=np.float64)
+            self.square_sums = np.array(meta['square_sums'], dtype=np.float64)
+        else:
+            os.makedirs(directory, exist_ok=True)
+            self.fields = list(fields)
+            self.params = dict(params or {})
+            self.ids = []
+            self.sums = np.zeros(len(self.fields))
+            self.square_sums = np.zeros(len(self.fields))
+            with open(self.matrix_path, 'wb') as f:
+                f.truncate(INITIAL_CAPACITY * self.dim * 4)
+
+        self.matrix = self._open_matrix()
+        # row of every id, removed rows are reused by later adds
+        self.rows = {id_: row for row, id_ in enumerate(self.ids) if id_ is not None}
+        self.free = [row for row, id_ in enumerate(self.ids) if id_ is None]
+        self.alive = np.array([id_ is not None for id_ in self.ids], dtype=bool)
+
+    @property
+    def dim(self):
+        return len(self.fields)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, id_):
+        return id_ in self.rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+        return False
+
+    def _open_matrix(self):
+        capacity = os.path.getsize(self.matrix_path) // (self.dim * 4)
+        return np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _reserve(self, n_rows):
+        # grows the file in place, the rows already written stay where they are
+        if n_rows <= len(self.matrix):
+            return
+        capacity = max(n_rows, 2 * len(self.matrix))
+        self.matrix.flush()
+        del self.matrix
+        with open(self.matrix_path, 'r+b') as f:
+            f.truncate(capacity * self.dim * 4)
+        self.matrix = self._open_matrix()
+
+    def add(self, ids, vectors):
+        # adds or replaces the vectors of the ids
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if len(set(ids)) != len(ids):
+            raise ValueError("duplicate ids in one add")
+
+        rows = np.empty(len(ids), dtype=np.int64)
+        new = [i for i, id_ in enumerate(ids) if id_ not in self.rows]
+        replaced = [i for i, id_ in enumerate(ids) if id_ in self.rows]
+
+        if replaced:
+            rows[replaced] = [self.rows[ids[i]] for i in replaced]
+            self._update_sums(self.matrix[rows[replaced]], -1)
+
+        reused = min(len(new), len(self.free))
+        appended = len(new) - reused
+        first_appended = len(self.ids)
+        self._reserve(first_appended + appended)
+        self.ids.extend([None] * appended)
+        self.alive = np.concatenate([self.alive, np.zeros(appended, dtype=bool)])
+        new_rows = self.free[:reused] + list(range(first_appended, first_appended + appended))
+        del self.free[:reused]
+
+        for i, row in zip(new, new_rows):
+            rows[i] = row
+            self.ids[row] = ids[i]
+            self.rows[ids[i]] = row
+        self.alive[rows] = True
+
+        self.matrix[rows] = vectors
+        self._update_sums(vectors, 1)
+
+    def remove(self, ids):
+        # returns the number of ids that were in the index
+        rows = [self.rows.pop(id_) for id_ in ids if id_ in self.rows]
+        if not rows:
+            return 0
+
+        self._update_sums(self.matrix[rows], -1)
+        for row in rows:
+            self.ids[row] = None
+        self.alive[rows] = False
+        self.matrix[rows] = 0
+        self.free = sorted(self.free + rows)
+        return len(rows)
+
+    def _update_sums(self, vectors, sign):
+        vectors = np.asarray(vectors, dtype=np.float64)
+        self.sums += sign * vectors.sum(axis=0)
+        self.square_sums += sign * (vectors**2).sum(axis=0)
+
+    def vectors(self, ids):
+        return np.array(self.matrix[[self.rows[id_] for id_ in ids]])
+
+    def stats(self):
+        # mean and standard deviation of every field over the stored vectors
+        n = max(len(self), 1)
+        mean = self.sums / n
+        variance = np.maximum(self.square_sums / n - mean**2, 0)
+        std = np.sqrt(variance)
+        # constant fields do not contribute to the distances
+        return mean, np.where(std > 1e-12 * np.maximum(np.abs(mean), 1), std, np.inf)
+
+    def query(self, vectors, k=5, exclude_rows=None):
+        # k nearest stored vectors of every query row, returns (ids, distances)
+        # as a list of id lists and a (queries, k) array, nearest first; rows of
+        # exclude_rows[i] are skipped for query i (e.g. the query itself)
+        queries = np.atleast_2d(np.asarray(vectors, dtype=np.float64))
+        k = min(k, len(self))
+        best_distances = np.full((len(queries), k), np.inf)
+        best_rows = np.full((len(queries), k), -1)
+        if k == 0:
+            return [[] for _ in queries], best_distances
+
+        mean, std = self.stats()
+        scaled_queries = (queries - mean) / std
+        query_norms = np.sum(scaled_queries**2, axis=1)[:, np.newaxis]
+
+        for start in range(0, len(self.ids), BATCH_ROWS):
+            stop = min(start + BATCH_ROWS, len(self.ids))
+            scaled = (np.asarray(self.matrix[start:stop], dtype=np.float64) - mean) / std
+
+            # |q - x|^2 = |q|^2 + |x|^2 - 2 q.x, all pairs of the batch at once
+            distances = query_norms + np.sum(scaled**2, axis=1) - 2 * scaled_queries @ scaled.T
+            distances[:, ~self.alive[start:stop]] = np.inf
+            if exclude_rows is not None:
+                for i, row in enumerate(exclude_rows):
+                    if row is not None and start <= row < stop:
+                        distances[i, row - start] = np.inf
+
+            # merge with the best rows so far
+            candidates = np.concatenate([best_distances, distances], axis=1)
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), distances.shape)], axis=1)
+            keep = np.argpartition(candidates, k - 1, axis=1)[:, :k]
+            best_distances = np.take_along_axis(candidates, keep, axis=1)
+            best_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+
+        order = np.argsort(best_distances, axis=1, kind='stable')
+        best_distances = np.sqrt(np.maximum(np.take_along_axis(best_distances, order, axis=1), 0))
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+
+        ids = [[self.ids[row] for row, distance in zip(rows, distances) if np.isfinite(distance)]
+               for rows, distances in zip(best_rows, best_distances)]
+        return ids, best_distances
+
+    def query_ids(self, ids, k=5):
+        # neighbours of stored vectors, without the vectors themselves
+        rows = [self.rows[id_] for id_ in ids]
+        return self.query(self.matrix[rows], k, exclude_rows=rows)
+
+    def flush(self):
+        self.matrix.flush()
+        meta = {
+            'fields': self.fields,
+            'params': self.params,
+            'ids': self.ids,
+            'sums': self.sums.tolist(),
+            'square_sums': self.square_sums.tolist(),
+        }
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self.meta_path)
@@ -0,0 +1,309 @@
+from functools import lru_cache
+import numpy as np
+from audio_core.parallel import chunk_ranges, map_chunks
+from audio_core.profiling import profiled
+
+# scipy.fft is imported by the functions that need it, librosa not at all:
+# stft_magnitude reproduces librosa.stft(window='hann') bit for bit
+
+# frames transformed together, bounds the complex FFT buffers
+BATCH_FRAMES = 4096
+
+@profiled()
+def compute_frequency_features(audio, sr, frame_size, frame_step, workers=1):
+    return framed_spectrum(audio, sr, frame_size, frame_step, features=True, workers=workers)['features']
+
+def fft_frequencies(sr, n_fft):
+    # librosa.fft_frequencies
+    return np.fft.rfftfreq(n_fft, d=1.0 / sr)
+
+@lru_cache(maxsize=16)
+def stft_window(N):
+    # periodic hann, computed like scipy.signal.get_window('hann', N) that librosa.stft uses
+    if N <= 1:
+        return np.ones(N)
+    fac = np.linspace(-np.pi, np.pi, N + 1)
+    window = (0.5 + 0.5 * np.cos(fac))[:-1]
+    window.setflags(write=False)
+    return window
+
+def stft_magnitude(audio, frame_size, frame_step, center=True, window=None):
+    # |librosa.stft(audio, n_fft=frame_size, hop_length=frame_step, window='hann', center=center)|,
+    # same values, dtype and (frequencies, frames) frame-major layout; window
+    # replaces the periodic hann window
+    if center:
+        audio = np.pad(audio, frame_size // 2)
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::frame_step]
+    if window is None:
+        window = stft_window(frame_size)
+
+    # librosa keeps the spectrum in complex64 for float32 input
+    complex_dtype = np.result_type(audio.dtype, np.complex64)
+    magnitude = np.empty((frame_size // 2 + 1, len(frames)), dtype=np.finfo(complex_dtype).dtype, order='F')
+
+    for start in range(0, len(frames), BATCH_FRAMES):
+        spectrum = np.fft.rfft(frames[start:start + BATCH_FRAMES] * window, axis=1)
+        magnitude.T[start:start + BATCH_FRAMES] = np.abs(spectrum.astype(complex_dtype))
+
+    return magnitude
+
+def analysis_window(window_type, N):
+    # 'hann' is the periodic window of stft_magnitude (librosa), the window of
+    # the spectral features and the cepstral pitch; the other types are the
+    # symmetric windows of the FFT panel
+    if window_type == 'hann':
+        return stft_window(N)
+    return get_window(window_type, N)
+
+def framed_spectrum(audio, sr, frame_size, frame_step, window_type='hann', magnitude=False, features=False,
+                    pitch_band=None, out=None, precomputed=None, workers=1):
+    # The one STFT pass behind the spectrogram, the spectral features and the
+    # cepstral pitch. The frames are centered like librosa.stft (zero padding
+    # of frame_size // 2 on both sides, frame i centered at i * frame_step) and
+    # transformed BATCH_FRAMES at a time, on the thread pool when workers > 1.
+    # Every batch is reduced to the requested results and dropped:
+    #   magnitude   (frequencies, frames) float32 matrix, written to out if given
+    #   features    spectral_features of the power spectrum
+    #   pitch_band  (min_quefrency, max_quefrency), cepstral F0 and peak prominence
+    # precomputed is the magnitude of an earlier pass with the same framing,
+    # its columns are reduced instead of transforming the frames again.
+    # Returns a dict with the requested results and 'freqs', 'times'.
+    freqs = fft_frequencies(sr, frame_size)
+    if precomputed is not None:
+        num_frames = precomputed.shape[1]
+    else:
+        padded = np.pad(audio, frame_size // 2)
+        num_frames = max(1 + (len(padded) - frame_size) // frame_step, 0)
+        window = analysis_window(window_type, frame_size)
+    result = {'freqs': freqs, 'times': np.arange(num_frames) * frame_step / sr}
+
+    if magnitude:
+        if out is None:
+            out = np.empty((len(freqs), num_frames), dtype=np.float32, order='F')
+        elif out.shape != (len(freqs), num_frames) or out.dtype != np.float32:
+            raise ValueError(f"out must be a float32 array of shape {(len(freqs), num_frames)}")
+        result['magnitude'] = out
+    if pitch_band is not None:
+        result['f0'] = np.zeros(num_frames)
+        result['prominence'] = np.zeros(num_frames)
+        # an empty band has no peaks
+        if pitch_band[0] >= pitch_band[1]:
+            pitch_band = None
+
+    def transform_batch(start, stop):
+        if precomputed is not None:
+            batch = precomputed[:, start:stop]
+        else:
+            segment = padded[start * frame_step:(stop - 1) * frame_step + frame_size]
+            batch = stft_magnitude(segment, frame_size, frame_step, center=False, window=window)
+        if magnitude:
+            out[:, start:stop] = batch
+        if pitch_band is not None:
+            result['f0'][start:stop], result['prominence'][start:stop] = magnitude_cepstral_peaks(batch, sr, frame_size, *pitch_band)
+        if features:
+            return spectral_features(batch**2, freqs)
+
+    batches = map_chunks(transform_batch, chunk_ranges(num_frames, BATCH_FRAMES), workers)
+    if features:
+        result['features'] = concatenate_features(batches, freqs)
+    return result
+
+def concatenate_features(batches, freqs):
+    # the per-frame features of consecutive batches as one dict
+    if not batches:
+        return spectral_features(np.zeros((len(freqs), 0), dtype=np.float32), freqs)
+    return {name: np.concatenate([batch[name] for batch in batches]) for name in batches[0]}
+
+def spectral_features(power_spectrum, freqs):
+    eps = 1e-10
+    vol = np.sum(power_spectrum, axis=0)
+
+    fc = np.sum(freqs[:, np.newaxis] * power_spectrum, axis=0) / (vol + eps)
+    bw = np.sqrt(np.sum(((freqs[:, np.newaxis] - fc[np.newaxis, :])**2) * power_spectrum, axis=0) / (vol + eps))
+
+    ersb1 = band_energy_ratio(power_spectrum, freqs, 0, 630, vol, eps)
+    ersb2 = band_energy_ratio(power_spectrum, freqs, 630, 1720, vol, eps)
+    ersb3 = band_energy_ratio(power_spectrum, freqs, 1720, 4400, vol, eps)
+
+    sfm = spectral_flatness(power_spectrum + eps)
+    scf = spectral_crest(power_spectrum + eps)
+
+    return {
+        "Volume": vol,
+        "Frequency Centroid": fc,
+        "Bandwidth": bw,
+        "ERSB1": ersb1,
+        "ERSB2": ersb2,
+        "ERSB3": ersb3,
+        "Spectral Flatness": sfm,
+        "Spectral Crest": scf,
+    }
+
+def band_energy_ratio(power, freqs, f_low, f_high, vol, eps):
+    band_mask = (freqs >= f_low) & (freqs < f_high)
+    band_energy = np.sum(power[band_mask, :], axis=0)
+    return band_energy / (vol + eps)
+
+def spectral_flatness(power):
+    geo_mean = np.exp(np.mean(np.log(power), axis=0))
+    arith_mean = np.mean(power, axis=0)
+    return geo_mean / (arith_mean + 1e-10)
+
+def spectral_crest(power):
+    max_val = np.max(power, axis=0)
+    mean_val = np.mean(power, axis=0)
+    return max_val / (mean_val + 1e-10)
+
+@profiled()
+def compute_fft(audio, sampling_rate, start_time, frame_length_sec, window_type=None):
+    start_sample = int(start_time * sampling_rate)
+    end_sample = int((start_time + frame_length_sec) * sampling_rate)
+
+    frame = audio[start_sample:end_sample]
+
+    if window_type:
+        frame = apply_window(frame, window_type)
+
+    fft_result = np.fft.rfft(frame)
+    magnitude = np.abs(fft_result)
+    freq = np.fft.rfftfreq(len(frame), d=1.0 / sampling_rate)
+
+    return freq, magnitude
+
+def rectangular_window(N):
+    return np.ones(N)
+
+def triangular_window(N):
+    n = np.arange(N)
+    if N % 2 == 0:
+        return np.where(n <= (N - 1) / 2, 2 * n / (N - 1), 2 - 2 * n / (N - 1))
+    else:
+        return 1 - np.abs((n - (N - 1) / 2) / ((N + 1) / 2))
+
+def hamming_window(N):
+    n = np.arange(N)
+    return 0.54 - 0.46 * np.cos(2 * np.pi * n / (N - 1))
+
+def hann_window(N):
+    n = np.arange(N)
+    return 0.5 * (1 - np.cos(2 * np.pi * n / (N - 1)))
+
+def blackman_window(N):
+    n = np.arange(N)
+    return 0.42 - 0.5 * np.cos(2 * np.pi * n / (N - 1)) + 0.08 * np.cos(4 * np.pi * n / (N - 1))
+
+def gaussian_window(N, sigma=0.4):
+    n = np.arange(0, N)
+    return np.exp(-0.5 * ((n - (N - 1) / 2) / (sigma * (N - 1) / 2)) ** 2)
+
+WINDOWS = {
+    'rectangular': rectangular_window,
+    'triangular': triangular_window,
+    'hamming': hamming_window,
+    'hann': hann_window,
+    'blackman': blackman_window,
+    'gaussian': gaussian_window,
+}
+
+@lru_cache(maxsize=64)
+def get_window(window_type, N, params=()):
+    # each (type, length, params) window is generated once, shared read-only
+    if window_type not in WINDOWS:
+        raise ValueError(f"Unknown window type: {window_type}")
+
+    window = WINDOWS[window_type](N, *params) if N > 1 else np.ones(N)
+    window.setflags(write=False)
+    return window
+
+def apply_window(signal, window_type='hamming', params=()):
+    # windows the last axis, so a whole (frames, N) matrix is windowed at once
+    signal = np.asarray(signal)
+    return signal * get_window(window_type, signal.shape[-1], params)
+    
+def spectrogram_shape(n_samples, frame_size, frame_step):
+    # shape of the centered frames of framed_spectrum
+    padded = n_samples + 2 * (frame_size // 2)
+    return frame_size // 2 + 1, max(1 + (padded - frame_size) // frame_step, 0)
+
+@profiled()
+def compute_spectrogram(audio, sr, frame_size, frame_step, window_type='hann', out=None):
+    # shape: (frequencies, frames), written in place batch by batch
+    result = framed_spectrum(audio, sr, frame_size, frame_step, window_type, magnitude=True, out=out)
+    return result['freqs'], result['times'], result['magnitude']
+
+@profiled()
+def compute_cepstral_pitch(audio, sr, frame_size, frame_step, f0_min=50, f0_max=400):
+    # returns frame times, F0 and the peak prominence (z-score of the cepstral
+    # peak within the searched band), low prominence means an unvoiced frame;
+    # the frames are those of compute_frequency_features
+    band = cepstral_band(sr, frame_size, f0_min, f0_max)
+    result = framed_spectrum(audio, sr, frame_size, frame_step, pitch_band=band)
+    return result['times'], result['f0'], result['prominence']
+
+def magnitude_cepstral_peaks(magnitude, sr, frame_size, min_quef, max_quef):
+    # cepstral F0 and prominence of every frame of a (frequencies, frames)
+    # magnitude: rFFT -> log magnitude -> irFFT is the real cepstrum of the frame
+    log_magnitude = np.log(magnitude.T + 1e-10)
+    cepstrum = np.fft.irfft(log_magnitude, n=frame_size, axis=1)
+    return cepstral_peaks(cepstrum, sr, min_quef, max_quef)
+
+def cepstral_band(sr, frame_size, f0_min, f0_max):
+    # the real cepstrum is symmetric, quefrencies past frame_size / 2 only mirror the first half
+    return int(sr / f0_max), min(int(sr / f0_min), frame_size // 2 + 1)
+
+def cepstral_peaks(cepstrum, sr, min_quef, max_quef):
+    # F0 and prominence of every row of a (frames, quefrency) cepstrum
+
+    # Szukamy piku w określonym zakresie quefrency
+    cepstrum_range = cepstrum[:, min_quef:max_quef]
+    peak_index = np.argmax(cepstrum_range, axis=1)
+    peak_value = cepstrum_range[np.arange(len(cepstrum_range)), peak_index]
+    peak_index += min_quef
+
+    f0 = np.where(peak_index > 0, sr / np.maximum(peak_index, 1), 0.0)
+
+    band_std = np.std(cepstrum_range, axis=1)
+    prominence = np.zeros(len(cepstrum_range))
+    np.divide(peak_value - np.mean(cepstrum_range, axis=1), band_std, out=prominence, where=band_std > 0)
+
+    return f0, prominence
+
+@profiled()
+def compute_global_cepstrum(audio, sr, mode='full', frame_size=4096, frame_step=None):
+    # mode 'full': one real cepstrum of the whole signal, zero-padded to a fast FFT length
+    # mode 'averaged': cepstrum of the mean power spectrum of hann frames (Welch), bounded memory
+    # only the first half is returned, the real cepstrum is symmetric
+    import scipy.fft
+
+    if mode == 'full':
+        n_fft = scipy.fft.next_fast_len(max(len(audio), 1), real=True)
+        log_spectrum = np.log(np.abs(scipy.fft.rfft(audio, n=n_fft)) + 1e-10)
+    elif mode == 'averaged':
+        n_fft = frame_size
+        log_spectrum = 0.5 * np.log(average_power_spectrum(audio, frame_size, frame_step) + 1e-20)
+    else:
+        raise ValueError(f"Unknown cepstrum mode: {mode}")
+
+    cepstrum = scipy.fft.irfft(log_spectrum, n=n_fft)[:n_fft // 2 + 1]
+
+    quefrency = np.arange(len(cepstrum)) / sr  # czas (s)
+    return quefrency, cepstrum
+
+def average_power_spectrum(audio, frame_size, frame_step=None):
+    # mean |rFFT|^2 of hann windowed frames, accumulated batch by batch
+    if frame_step is None:
+        frame_step = frame_size // 2
+    if len(audio) < frame_size:
+        audio = np.pad(audio, (0, frame_size - len(audio)))
+
+    import scipy.fft
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::frame_step]
+    window = get_window('hann', frame_size)
+    power = np.zeros(frame_size // 2 + 1)
+
+    for start in range(0, len(frames), BATCH_FRAMES):
+        spectrum = scipy.fft.rfft(frames[start:start + BATCH_FRAMES] * window, axis=1)
+        power += np.sum(spectrum.real**2 + spectrum.imag**2, axis=0)
+
+    return power / len(frames)
@@ -0,0 +1,46 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs independent chunks of the frame axis on a shared thread pool. NumPy
+# reductions, the FFTs and the nogil numba kernels release the GIL, so the
+# chunks run in parallel; results are returned in chunk order and every chunk
+# computes exactly what the single threaded path computes for its frames.
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def resolve_workers(workers):
+    # None or 0 means one worker per CPU
+    if not workers:
+        return os.cpu_count() or 1
+    return max(int(workers), 1)
+
+
+def get_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ThreadPoolExecutor(workers, thread_name_prefix=f"audio-core-{workers}")
+        return pool
+
+
+def chunk_ranges(n, chunk_size):
+    # fixed (start, stop) ranges, for kernels whose results depend on the chunk layout
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+def split_ranges(n, parts):
+    # about equal (start, stop) ranges, at most parts of them
+    parts = max(min(parts, n), 1)
+    bounds = [i * n // parts for i in range(parts + 1)]
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def map_chunks(func, chunks, workers=1):
+    # [func(start, stop) for every chunk], on the thread pool when workers > 1
+    workers = resolve_workers(workers)
+    if workers == 1 or len(chunks) <= 1:
+        return [func(start, stop) for start, stop in chunks]
+
+    return list(get_pool(workers).map(lambda chunk: func(*chunk), chunks))
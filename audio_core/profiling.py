@@ -0,0 +1,182 @@
+import functools
+import json
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Per-stage wall time, CPU time of the calling thread and tracemalloc peak.
+# Profiles are collected per thread (one Streamlit session runs in one thread),
+# stage() and @profiled cost a thread-local lookup when no profile is active:
+#
+#   with profiling.session(enabled=True) as profile:
+#       with profiling.stage("load"):
+#           ...
+#   print(profile.to_json())
+#
+# CPU time is per thread: other sessions do not show up in it, but neither does
+# the work a stage hands to the thread pool (workers > 1), compare wall time.
+# tracemalloc is global: allocations of other threads at the same time show
+# up in the peaks, and resetting the peak for one stage would cut the stages
+# of every other session tracing memory. Only one session traces memory at a
+# time, the others that ask for it are profiled without peaks
+# (memory_refused is set).
+
+_state = threading.local()
+
+# the session tracing memory stops tracemalloc at its end if it started it
+_tracing_lock = threading.Lock()
+_tracing = False
+_started_tracing = False
+
+
+class Profile:
+    def __init__(self, trace_memory=True, memory_refused=False):
+        self.trace_memory = trace_memory
+        # memory tracing was asked for while another session held it
+        self.memory_refused = memory_refused
+        # one record per stage in start order, children follow their parent
+        self.records = []
+        self._stack = []
+
+    def rows(self):
+        # records for display, names indented by nesting depth
+        rows = []
+        for record in self.records:
+            row = {
+                'stage': "  " * record['depth'] + record['name'],
+                'wall ms': round(record['wall_s'] * 1000, 2),
+                'thread cpu ms': round(record['thread_cpu_s'] * 1000, 2),
+            }
+            if self.trace_memory:
+                row['peak MiB'] = round(record['peak_bytes'] / 2**20, 2)
+            rows.append(row)
+        return rows
+
+    def to_json(self):
+        return json.dumps({'trace_memory': self.trace_memory, 'memory_refused': self.memory_refused,
+                           'stages': self.records}, indent=1)
+
+
+class _Stage:
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        profile = self.profile
+        self.record = {'name': self.name, 'depth': len(profile._stack), 'wall_s': 0.0, 'thread_cpu_s': 0.0}
+        profile.records.append(self.record)
+
+        if profile.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # the parent keeps the peak reached so far, the child starts from the current usage
+            if profile._stack:
+                parent = profile._stack[-1]
+                parent.max_traced = max(parent.max_traced, peak)
+            tracemalloc.reset_peak()
+            self.record['peak_bytes'] = 0
+            self.start_traced = current
+            self.max_traced = current
+
+        profile._stack.append(self)
+        self.start_cpu = time.thread_time()
+        self.start_wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record['wall_s'] = time.perf_counter() - self.start_wall
+        self.record['thread_cpu_s'] = time.thread_time() - self.start_cpu
+
+        profile = self.profile
+        profile._stack.pop()
+
+        if profile.trace_memory:
+            peak = max(self.max_traced, tracemalloc.get_traced_memory()[1])
+            self.record['peak_bytes'] = peak - self.start_traced
+            if profile._stack:
+                parent = profile._stack[-1]
+                parent.max_traced = max(parent.max_traced, peak)
+            tracemalloc.reset_peak()
+
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+def active_profile():
+    return getattr(_state, 'profile', None)
+
+
+def stage(name):
+    profile = getattr(_state, 'profile', None)
+    if profile is None:
+        return _NULL_STAGE
+    return _Stage(profile, name)
+
+
+def profiled(name=None):
+    # decorator, records every call of the function as a stage
+    def decorate(func):
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = getattr(_state, 'profile', None)
+            if profile is None:
+                return func(*args, **kwargs)
+            with _Stage(profile, label):
+                return func(*args, **kwargs)
+
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def session(enabled=True, trace_memory=True):
+    # activates a new profile for the current thread, yields None when disabled
+    if not enabled:
+        yield None
+        return
+
+    traced = trace_memory and _start_tracing()
+    profile = Profile(traced, memory_refused=trace_memory and not traced)
+    _state.profile = profile
+    try:
+        yield profile
+    finally:
+        _state.profile = None
+        if traced:
+            _stop_tracing()
+
+
+def _start_tracing():
+    # False when another session is tracing memory
+    global _tracing, _started_tracing
+    with _tracing_lock:
+        if _tracing:
+            return False
+        _tracing = True
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started_tracing = True
+        return True
+
+
+def _stop_tracing():
+    # tracing started by someone else (e.g. python -X tracemalloc) keeps running
+    global _tracing, _started_tracing
+    with _tracing_lock:
+        _tracing = False
+        if _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
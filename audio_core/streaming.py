@@ -0,0 +1,186 @@
+import numpy as np
+from audio_core.audio_params import get_audio_params
+from audio_core.clip_params import clip_row, clip_params_frame
+from audio_core.frequency_features import fft_frequencies, spectral_features, stft_magnitude
+from audio_core.wav import UnsupportedWav, open_wav
+
+# samples read from disk at once, peak memory of the streaming paths scales with it
+BLOCK_SIZE = 65536
+
+def read_blocks(path, block_size=BLOCK_SIZE):
+    # yields mono float32 blocks, the same samples librosa.load(path, sr=None) returns
+    try:
+        wav = open_wav(path)
+    except UnsupportedWav:
+        yield from _read_soundfile_blocks(path, block_size)
+    else:
+        yield from wav.blocks(block_size)
+
+
+def _read_soundfile_blocks(path, block_size):
+    import soundfile as sf
+
+    with sf.SoundFile(path) as f:
+        for block in f.blocks(blocksize=block_size, dtype='float32', always_2d=True):
+            yield block[:, 0] if block.shape[1] == 1 else block.mean(axis=1)
+
+
+def get_sampling_rate(path):
+    try:
+        return open_wav(path).sampling_rate
+    except UnsupportedWav:
+        import soundfile as sf
+
+        return sf.info(path).samplerate
+
+
+class FrameBuffer:
+    # carries the overlap between blocks so that pushed blocks produce exactly
+    # the frames sliding_window_view(audio, frame_size)[::frame_step] would
+    def __init__(self, frame_size, frame_step):
+        self.frame_size = frame_size
+        self.frame_step = frame_step
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.next_frame = 0
+        self.total_samples = 0
+        # samples to drop before the next frame starts, only when frame_step > frame_size
+        self.skip = 0
+
+    def push(self, samples):
+        # returns (index of the first complete frame, samples covering the
+        # complete frames), the segment is None when no frame is complete yet
+        samples = np.asarray(samples, dtype=np.float32)
+        self.total_samples += len(samples)
+        if self.skip:
+            dropped = min(self.skip, len(samples))
+            samples = samples[dropped:]
+            self.skip -= dropped
+        buffer = np.concatenate([self.buffer, samples]) if len(self.buffer) else samples
+
+        n_frames = (len(buffer) - self.frame_size) // self.frame_step + 1 if len(buffer) >= self.frame_size else 0
+        first_frame = self.next_frame
+        self.next_frame += n_frames
+
+        if n_frames == 0:
+            self.buffer = buffer.copy()
+            return first_frame, None
+
+        segment = buffer[:(n_frames - 1) * self.frame_step + self.frame_size]
+        next_start = n_frames * self.frame_step
+        self.skip = max(next_start - len(buffer), 0)
+        self.buffer = buffer[next_start:].copy()
+        return first_frame, segment
+
+
+# Streaming counterparts of get_audio_params and get_clip_params. They take an
+# iterable of mono sample blocks (e.g. read_blocks) and
+# yield the same results chunk by chunk, holding only about one block in memory.
+
+def stream_audio_params(blocks, sampling_rate, frame_size, frame_step, silence_vol_threshold, silence_zcr_threshold, voiced_vol_threshold, voiced_zcr_threshold, yin_threshold=None):
+    framer = FrameBuffer(frame_size, frame_step)
+
+    for block in blocks:
+        first_frame, segment = framer.push(block)
+        if segment is None:
+            continue
+
+        params = get_audio_params(segment,
+                                  sampling_rate,
+                                  frame_size,
+                                  frame_step,
+                                  silence_vol_threshold,
+                                  silence_zcr_threshold,
+                                  voiced_vol_threshold,
+                                  voiced_zcr_threshold,
+                                  yin_threshold)
+        params['time'] = np.arange(first_frame, first_frame + len(params)) * frame_step / sampling_rate
+        yield params
+
+
+def stream_clip_params(blocks, sampling_rate, frame_size, frame_step):
+    # buffer holds the samples from buffer_start on, a second is emitted once
+    # both its samples and all of its frames have arrived
+    buffer = np.zeros(0, dtype=np.float32)
+    buffer_start = 0
+    second = 0
+
+    for block in blocks:
+        buffer = np.concatenate([buffer, block])
+        first_second = second
+        rows = []
+
+        while True:
+            start_idx = second * sampling_rate
+            end_idx = (second + 1) * sampling_rate
+            first_frame = start_idx // frame_step
+            last_frame = end_idx // frame_step
+            needed = max(end_idx, (last_frame - 1) * frame_step + frame_size)
+            if buffer_start + len(buffer) < needed:
+                break
+
+            rows.append(_buffered_clip_row(buffer, buffer_start, start_idx, end_idx, first_frame, last_frame, frame_size, frame_step))
+            second += 1
+
+            # the next second starts at its first frame or its first sample, whichever is earlier
+            drop = (end_idx // frame_step) * frame_step - buffer_start
+            buffer = buffer[drop:]
+            buffer_start += drop
+
+        if rows:
+            yield clip_params_frame(rows, first_second)
+
+    # tail, the total length is known now
+    total = buffer_start + len(buffer)
+    if frame_size > total:
+        frame_size = total
+    n_frames = (total - frame_size) // frame_step + 1 if frame_size > 0 else 0
+    num_seconds = int(np.ceil(total / sampling_rate))
+
+    first_second = second
+    rows = []
+    for second in range(first_second, num_seconds):
+        start_idx = second * sampling_rate
+        end_idx = min((second + 1) * sampling_rate, total)
+        first_frame = start_idx // frame_step
+        last_frame = min((second + 1) * sampling_rate // frame_step, n_frames)
+        rows.append(_buffered_clip_row(buffer, buffer_start, start_idx, end_idx, first_frame, last_frame, frame_size, frame_step))
+
+    if rows:
+        yield clip_params_frame(rows, first_second)
+
+
+def _buffered_clip_row(buffer, buffer_start, start_idx, end_idx, first_frame, last_frame, frame_size, frame_step):
+    clip = buffer[start_idx - buffer_start:end_idx - buffer_start]
+
+    if last_frame > first_frame:
+        frames_start = first_frame * frame_step - buffer_start
+        frames_end = (last_frame - 1) * frame_step + frame_size - buffer_start
+        frames_audio = buffer[frames_start:frames_end]
+    else:
+        frames_audio = buffer[:0]
+
+    return clip_row(clip, frames_audio, frame_size, frame_step)
+
+
+# Streaming counterpart of compute_frequency_features. Blocks of mono samples
+# (e.g. read_blocks) go in, dicts with the same keys come
+# out chunk by chunk. The signal is zero-padded by frame_size // 2 on both ends
+# like the centered frames of stft_magnitude, so the frames match the in-memory path.
+
+def stream_frequency_features(blocks, sr, frame_size, frame_step):
+    framer = FrameBuffer(frame_size, frame_step)
+    freqs = fft_frequencies(sr, frame_size)
+    padding = np.zeros(frame_size // 2, dtype=np.float32)
+
+    for block in _padded(blocks, padding):
+        _, segment = framer.push(block)
+        if segment is None:
+            continue
+
+        power_spectrum = stft_magnitude(segment, frame_size, frame_step, center=False)**2
+        yield spectral_features(power_spectrum, freqs)
+
+def _padded(blocks, padding):
+    yield padding
+    yield from blocks
+    yield padding
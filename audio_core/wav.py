@@ -0,0 +1,170 @@
+import glob
+import os
+import struct
+import numpy as np
+from audio_core.profiling import profiled
+
+# PCM / IEEE float WAV reader. The data chunk is memory-mapped (files) or
+# wrapped without copying (bytes and uploads), samples are converted to mono
+# float32 only when accessed, either all at once or block by block. The values
+# match librosa.load(..., sr=None); other formats fall back to librosa.
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# the chunks before the data chunk have to fit into this many bytes
+HEADER_LIMIT = 1 << 16
+
+# storage dtype per (format, bits per sample), 24 bit samples are kept as raw bytes
+SAMPLE_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 24): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+class UnsupportedWav(ValueError):
+    pass
+
+
+def parse_header(header, file_size):
+    # returns (format, channels, sampling rate, bits per sample, data offset, data size)
+    if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+        raise UnsupportedWav("not a RIFF/WAVE file")
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(header):
+        chunk_id, chunk_size = struct.unpack_from('<4sI', header, pos)
+        body = pos + 8
+
+        if chunk_id == b'fmt ':
+            if chunk_size < 16 or body + 16 > len(header):
+                raise UnsupportedWav("truncated fmt chunk")
+            audio_format, channels, sampling_rate, _, _, bits = struct.unpack_from('<HHIIHH', header, body)
+            if audio_format == WAVE_FORMAT_EXTENSIBLE:
+                if chunk_size < 40 or body + 26 > len(header):
+                    raise UnsupportedWav("truncated extensible fmt chunk")
+                # the sub format GUID starts with the actual format tag
+                audio_format, = struct.unpack_from('<H', header, body + 24)
+            fmt = (audio_format, channels, sampling_rate, bits)
+
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise UnsupportedWav("data chunk before fmt chunk")
+            # streamed files may carry a placeholder size
+            data_size = min(chunk_size, file_size - body)
+            return fmt + (body, data_size)
+
+        # chunks are padded to an even size
+        pos = body + chunk_size + (chunk_size & 1)
+
+    raise UnsupportedWav("no data chunk in the header")
+
+
+class WavFile:
+    # source is a path or a bytes-like object with the whole file
+    def __init__(self, source):
+        if isinstance(source, (str, os.PathLike)):
+            file_size = os.path.getsize(source)
+            with open(source, 'rb') as f:
+                header = f.read(HEADER_LIMIT)
+        else:
+            source = memoryview(source).cast('B')
+            file_size = len(source)
+            header = bytes(source[:HEADER_LIMIT])
+
+        audio_format, self.channels, self.sampling_rate, self.bits, offset, size = parse_header(header, file_size)
+
+        dtype = SAMPLE_DTYPES.get((audio_format, self.bits))
+        if dtype is None or self.channels < 1:
+            raise UnsupportedWav(f"unsupported sample format {audio_format:#x} with {self.bits} bits")
+
+        block_align = self.channels * self.bits // 8
+        self.n_samples = size // block_align
+        size = self.n_samples * block_align
+
+        if isinstance(source, memoryview):
+            data = np.frombuffer(source, dtype=np.uint8, count=size, offset=offset)
+        elif size > 0:
+            data = np.memmap(source, dtype=np.uint8, mode='r', offset=offset, shape=(size,)).view(np.ndarray)
+        else:
+            data = np.zeros(0, dtype=np.uint8)
+
+        # (samples, channels) in the storage format, (samples, channels, 3) for 24 bit
+        if self.bits == 24:
+            self.raw = data.reshape(self.n_samples, self.channels, 3)
+        else:
+            self.raw = data.view(dtype).reshape(self.n_samples, self.channels)
+
+        self._audio = None
+
+    def __len__(self):
+        return self.n_samples
+
+    @property
+    def audio(self):
+        # mono float32 samples, converted on first access; mono float32
+        # files are returned as a read-only view of the data itself
+        if self._audio is None:
+            self._audio = self.block(0, self.n_samples)
+        return self._audio
+
+    def block(self, start, stop):
+        raw = self.raw[start:stop]
+
+        if self.bits == 24:
+            # sign extended little endian 24 bit integers
+            samples = (raw[..., 0].astype(np.int32) | raw[..., 1].astype(np.int32) << 8 | raw[..., 2].astype(np.int8).astype(np.int32) << 16)
+            samples = samples.astype(np.float32) * np.float32(1 / 2**23)
+        elif self.bits == 8:
+            samples = (raw.astype(np.float32) - 128) * np.float32(1 / 128)
+        elif raw.dtype.kind == 'i':
+            samples = raw.astype(np.float32) * np.float32(1 / 2**(self.bits - 1))
+        else:
+            samples = raw.astype(np.float32, copy=False)
+
+        if self.channels == 1:
+            return samples[:, 0]
+        return samples.mean(axis=1, dtype=np.float32)
+
+    def blocks(self, block_size):
+        for start in range(0, self.n_samples, block_size):
+            yield self.block(start, start + block_size)
+
+
+def find_files(paths):
+    # WAV files under the given files and directories (searched recursively), sorted absolute paths
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "**", "*.wav"), recursive=True))
+        else:
+            files.append(path)
+    return sorted(os.path.abspath(f) for f in files)
+
+
+def open_wav(source):
+    # source: path, bytes-like object or a file object with getvalue() (e.g. a Streamlit upload)
+    if hasattr(source, 'getvalue'):
+        source = source.getvalue()
+    return WavFile(source)
+
+
+@profiled()
+def load_wav(source):
+    # drop-in replacement for librosa.load(source, sr=None)
+    try:
+        wav = open_wav(source)
+    except UnsupportedWav:
+        import librosa
+
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return librosa.load(source, sr=None)
+
+    return wav.audio, wav.sampling_rate
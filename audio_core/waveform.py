@@ -0,0 +1,78 @@
+import numpy as np
+
+# number of (min, max) pairs sent to the browser for one waveform plot
+DEFAULT_WIDTH = 2000
+
+def minmax_decimate(samples, width=DEFAULT_WIDTH):
+    # reduces samples to one (min, max) pair per column, keeps the peaks;
+    # returns (sample positions, values), short inputs are returned as they are
+    samples = np.asarray(samples)
+    n = len(samples)
+    if n <= 2 * width:
+        return np.arange(n), samples
+
+    edges = np.arange(width + 1) * n // width
+    return _bucket_minmax(samples, samples, edges, edges)
+
+
+def _bucket_minmax(mins, maxs, edges, positions):
+    # edges index into mins/maxs and end at their length,
+    # positions are the matching sample positions
+    bucket_mins = np.minimum.reduceat(mins, edges[:-1])
+    bucket_maxs = np.maximum.reduceat(maxs, edges[:-1])
+    centers = (positions[:-1] + positions[1:]) / 2
+
+    return np.repeat(centers, 2), np.column_stack([bucket_mins, bucket_maxs]).ravel()
+
+
+class WaveformPyramid:
+    # min/max envelopes of the signal at block sizes base_block * factor**level,
+    # built once per file so any time range is rendered from at most a few
+    # thousand precomputed values instead of the raw samples
+    def __init__(self, audio, sampling_rate, base_block=16, factor=4, min_blocks=DEFAULT_WIDTH):
+        self.audio = np.asarray(audio)
+        self.sampling_rate = sampling_rate
+        self.levels = []
+
+        block = base_block
+        starts = np.arange(0, len(self.audio), block)
+        if len(starts) == 0:
+            return
+        mins = np.minimum.reduceat(self.audio, starts)
+        maxs = np.maximum.reduceat(self.audio, starts)
+
+        while True:
+            self.levels.append((block, mins, maxs))
+            if len(mins) <= min_blocks:
+                break
+            starts = np.arange(0, len(mins), factor)
+            mins = np.minimum.reduceat(mins, starts)
+            maxs = np.maximum.reduceat(maxs, starts)
+            block *= factor
+
+    def envelope(self, start_time=0, end_time=None, width=DEFAULT_WIDTH):
+        # returns (times [s], values) with at most 2 * width points
+        start = max(int(start_time * self.sampling_rate), 0)
+        end = len(self.audio) if end_time is None else min(int(end_time * self.sampling_rate), len(self.audio))
+        n = end - start
+
+        if n <= 2 * width:
+            return np.arange(start, end) / self.sampling_rate, self.audio[start:end]
+
+        # coarsest level that still has at least one block per column
+        level = None
+        for block, mins, maxs in self.levels:
+            if block * width <= n:
+                level = (block, mins, maxs)
+        if level is None:
+            positions, values = minmax_decimate(self.audio[start:end], width)
+            return (positions + start) / self.sampling_rate, values
+
+        block, mins, maxs = level
+        first = start // block
+        last = -(-end // block)
+        edges = np.arange(width + 1) * (last - first) // width
+        positions = np.minimum((first + edges) * block, len(self.audio))
+        times, values = _bucket_minmax(mins[first:last], maxs[first:last], edges, positions)
+
+        return times / self.sampling_rate, values
@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio_core.feature_cache import DEFAULT_DIR, cached, file_digest, get_cache
+from audio_core.wav import find_files, load_wav
+from audio_core.audio_params import get_audio_params
+from audio_core.clip_params import get_clip_params, clip_params_arrays
+from audio_core.frequency_features import compute_frequency_features, compute_cepstral_pitch
+
+# Headless batch runner: analyses every WAV file under the given paths on a
+# process pool and writes all tables of the run into one columnar .npz file,
+# keys are "<table>.<column>" and every table has a file_id column indexing "files".
+#
+#   python batch_analysis.py example_audio -o results.npz --workers 8
+#
+# Finished files are kept as parts in <output>.parts, so an interrupted run
+# continues where it stopped when started again with --resume; the parts
+# record the analysis options and resuming with other ones is refused. Results
+# are also kept in the feature cache shared with the apps (--cache-dir), a file
+# analysed before with the same parameters is only loaded.
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Batch time and frequency analysis of WAV files.")
+    parser.add_argument("paths", nargs="+", help="WAV files or directories searched recursively")
+    parser.add_argument("-o", "--output", default="analysis.npz", help="consolidated output file (.npz)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="threads per file for the frame kernels, useful with few long files and --workers 1")
+    parser.add_argument("--chunksize", type=int, default=1, help="files sent to a worker at once")
+    parser.add_argument("--resume", action="store_true", help="reuse parts left by an interrupted run")
+    parser.add_argument("--cache-dir", default=os.environ.get('AUDIO_FEATURE_CACHE', DEFAULT_DIR), help="feature cache directory")
+    parser.add_argument("--cache-size-mb", type=float, default=2048, help="size cap of the feature cache")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the feature cache")
+    parser.add_argument("--frame-size", type=int, default=512)
+    parser.add_argument("--frame-step", type=int, default=256)
+    parser.add_argument("--silence-vol-threshold", type=float, default=0.008)
+    parser.add_argument("--silence-zcr-threshold", type=float, default=0.07)
+    parser.add_argument("--voiced-vol-threshold", type=float, default=0.015)
+    parser.add_argument("--voiced-zcr-threshold", type=float, default=0.05)
+    parser.add_argument("--f0-min", type=float, default=50)
+    parser.add_argument("--f0-max", type=float, default=400)
+    return parser.parse_args(argv)
+
+
+def analyze_file(path, options):
+    audio, sampling_rate = load_wav(path)
+    cache = None if options.no_cache else get_cache(options.cache_dir, int(options.cache_size_mb * 2**20))
+    digest = file_digest(path) if cache is not None else None
+    framing = {'frame_size': options.frame_size, 'frame_step': options.frame_step}
+
+    # thresholded per-frame parameters are batch entries; the clip parameters,
+    # frequency features and pitch below use the keys of the apps and are shared
+    audio_params_key = dict(framing,
+                            silence_vol_threshold=options.silence_vol_threshold,
+                            silence_zcr_threshold=options.silence_zcr_threshold,
+                            voiced_vol_threshold=options.voiced_vol_threshold,
+                            voiced_zcr_threshold=options.voiced_zcr_threshold,
+                            yin_threshold=None)
+    params = cached(cache, 'audio_params', digest, audio_params_key,
+                    lambda: get_audio_params(audio,
+                                             sampling_rate,
+                                             options.frame_size,
+                                             options.frame_step,
+                                             options.silence_vol_threshold,
+                                             options.silence_zcr_threshold,
+                                             options.voiced_vol_threshold,
+                                             options.voiced_zcr_threshold,
+                                             workers=options.threads))
+
+    clip_params = cached(cache, 'clip_params', digest, dict(framing, clip_length=1),
+                         lambda: clip_params_arrays(get_clip_params(audio, sampling_rate, options.frame_size, options.frame_step,
+                                                                    workers=options.threads)))
+    freq_features = cached(cache, 'frequency_features', digest, framing,
+                           lambda: compute_frequency_features(audio, sampling_rate, options.frame_size, options.frame_step,
+                                                              workers=options.threads))
+    # the F0 range is keyed as floats on both sides, the app's number inputs give ints
+    pitch_key = dict(framing, f0_min=float(options.f0_min), f0_max=float(options.f0_max))
+    times, f0_values, prominence = cached(cache, 'pitch', digest, pitch_key,
+                                          lambda: compute_cepstral_pitch(audio,
+                                                                         sampling_rate,
+                                                                         frame_size=options.frame_size,
+                                                                         frame_step=options.frame_step,
+                                                                         f0_min=options.f0_min,
+                                                                         f0_max=options.f0_max))
+
+    tables = {
+        'frames': {name: params[name] for name in params.dtype.names},
+        'clips': {'second': np.arange(1, len(clip_params['index']) + 1)},
+        'spectral': dict(freq_features),
+        'pitch': {'time': times, 'f0': f0_values, 'prominence': prominence},
+    }
+    for column, values in clip_params.items():
+        if column != 'index':
+            tables['clips'][column] = values
+    tables['file'] = {'sampling_rate': np.array([sampling_rate]), 'duration': np.array([len(audio) / sampling_rate])}
+
+    return tables
+
+
+def part_path(parts_dir, path):
+    return os.path.join(parts_dir, hashlib.sha256(path.encode()).hexdigest() + ".npz")
+
+
+# options that change the results, kept with the parts so that --resume never
+# mixes parameter sets in one output
+ANALYSIS_OPTIONS = ['frame_size', 'frame_step', 'silence_vol_threshold', 'silence_zcr_threshold',
+                    'voiced_vol_threshold', 'voiced_zcr_threshold', 'f0_min', 'f0_max']
+
+def analysis_options(options):
+    return {name: getattr(options, name) for name in ANALYSIS_OPTIONS}
+
+
+def check_resume(parts_dir, options):
+    # exits when the parts were made with other analysis options
+    try:
+        with open(os.path.join(parts_dir, "options.json")) as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        recorded = {}
+
+    current = analysis_options(options)
+    changed = [name for name in ANALYSIS_OPTIONS if recorded.get(name) != current[name]]
+    if changed:
+        sys.exit(f"the parts in {parts_dir} were made with other options ({', '.join(changed)}), "
+                 f"run without --resume to start over")
+
+
+def run_part(path, options, parts_dir):
+    # runs in a worker, the part is written atomically so a crash never leaves a truncated one
+    try:
+        tables = analyze_file(path, options)
+    except Exception as e:
+        return path, f"{type(e).__name__}: {e}"
+
+    target = part_path(parts_dir, path)
+    tmp = target + ".tmp.npz"
+    np.savez(tmp, **{f"{table}.{column}": values for table, columns in tables.items() for column, values in columns.items()})
+    os.replace(tmp, target)
+    return path, None
+
+
+def consolidate(files, parts_dir, output):
+    columns = {}
+    for file_id, path in enumerate(files):
+        with np.load(part_path(parts_dir, path)) as part:
+            lengths = {}
+            for key in part.files:
+                values = part[key]
+                columns.setdefault(key, []).append(values)
+                lengths[key.split(".", 1)[0]] = len(values)
+
+        for table, length in lengths.items():
+            columns.setdefault(f"{table}.file_id", []).append(np.full(length, file_id, dtype=np.int32))
+
+    data = {key: np.concatenate(values) for key, values in columns.items()}
+    data['files'] = np.array(files)
+
+    tmp = output + ".tmp.npz"
+    np.savez(tmp, **data)
+    os.replace(tmp, output)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    files = find_files(options.paths)
+    if not files:
+        sys.exit("no WAV files found")
+
+    parts_dir = options.output + ".parts"
+    if options.resume and os.path.isdir(parts_dir):
+        check_resume(parts_dir, options)
+    else:
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    os.makedirs(parts_dir, exist_ok=True)
+    with open(os.path.join(parts_dir, "options.json"), 'w') as f:
+        json.dump(analysis_options(options), f)
+
+    todo = [f for f in files if not os.path.exists(part_path(parts_dir, f))]
+    print(f"{len(files)} files, {len(files) - len(todo)} already done, {options.workers} workers", file=sys.stderr)
+
+    failed = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=options.workers) as pool:
+        results = pool.map(run_part, todo, [options] * len(todo), [parts_dir] * len(todo), chunksize=options.chunksize)
+        for done, (path, error) in enumerate(results, 1):
+            if error:
+                failed[path] = error
+                print(f"[{done}/{len(todo)}] FAILED {path}: {error}", file=sys.stderr)
+            else:
+                print(f"[{done}/{len(todo)}] {path}", file=sys.stderr)
+
+    finished = [f for f in files if f not in failed]
+    consolidate(finished, parts_dir, options.output)
+    print(f"wrote {options.output} ({len(finished)} files) in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+
+    if failed:
+        sys.exit(1)
+    shutil.rmtree(parts_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import io
+import os
+import sys
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import librosa
+import soundfile
+from audio_core.wav import load_wav
+from audio_core.frequency_features import stft_magnitude
+
+# Regression check of the librosa replacements: load_wav has to return the
+# samples and rate of librosa.load(path, sr=None) and stft_magnitude the values
+# of np.abs(librosa.stft(..., window='hann')), bit for bit, same dtype and
+# shape. Runs over example_audio plus the example files re-encoded in every
+# PCM and float subtype the reader supports, needs librosa and soundfile:
+#
+#   python benchmarks/check_librosa_parity.py
+#   python benchmarks/check_librosa_parity.py --frame-sizes 512 --files example_audio/Znormalizowane/jeden_1.wav
+#
+# Exits with status 1 and lists the mismatches when any value differs.
+
+SUBTYPES = ['PCM_U8', 'PCM_16', 'PCM_24', 'PCM_32', 'FLOAT', 'DOUBLE']
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare load_wav and stft_magnitude with librosa.")
+    parser.add_argument("--files", nargs="+", help="WAV files to check, default example_audio")
+    parser.add_argument("--frame-sizes", type=int, nargs="+", default=[256, 512, 2048])
+    parser.add_argument("--subtypes", nargs="*", default=SUBTYPES, help="WAV subtypes the files are re-encoded in")
+    return parser.parse_args(argv)
+
+
+def same(a, b):
+    return a.dtype == b.dtype and a.shape == b.shape and np.array_equal(a, b)
+
+
+def check_load(name, source, reference_source):
+    # source is read by load_wav, reference_source by librosa
+    audio, sampling_rate = load_wav(source)
+    reference, reference_rate = librosa.load(reference_source, sr=None)
+    if sampling_rate != reference_rate or not same(np.asarray(audio), reference):
+        return [f"load_wav {name}"]
+    return []
+
+
+def check_stft(name, audio, frame_sizes):
+    failures = []
+    for frame_size in frame_sizes:
+        if len(audio) < frame_size:
+            continue
+        for frame_step in (frame_size // 4, frame_size // 2):
+            for center in (True, False):
+                magnitude = stft_magnitude(audio, frame_size, frame_step, center=center)
+                reference = np.abs(librosa.stft(audio, n_fft=frame_size, hop_length=frame_step, window='hann', center=center))
+                if not same(magnitude, reference):
+                    failures.append(f"stft_magnitude {name} frame_size={frame_size} frame_step={frame_step} center={center}")
+    return failures
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    files = options.files or sorted(glob.glob(os.path.join(ROOT, "example_audio", "**", "*.wav"), recursive=True))
+    if not files:
+        sys.exit("no WAV files found")
+
+    failures = []
+    for path in files:
+        name = os.path.relpath(path, ROOT)
+        failures += check_load(name, path, path)
+
+        audio, sampling_rate = librosa.load(path, sr=None)
+        failures += check_stft(name, audio, options.frame_sizes)
+
+        # the other sample formats, read from bytes like an upload
+        for subtype in options.subtypes:
+            buffer = io.BytesIO()
+            soundfile.write(buffer, audio, sampling_rate, subtype=subtype, format='WAV')
+            failures += check_load(f"{name} ({subtype})", buffer.getvalue(), io.BytesIO(buffer.getvalue()))
+
+    for failure in failures:
+        print(f"MISMATCH {failure}", file=sys.stderr)
+    print(f"{len(files)} files, {len(failures)} mismatches", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
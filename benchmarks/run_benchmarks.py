@@ -0,0 +1,311 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'time_analysis_app'), os.path.join(ROOT, 'frequency_analysis_app')]
+
+import plotly.graph_objects as go
+from audio_core.wav import load_wav
+from audio_core.audio_params import get_audio_params
+from audio_core.clip_params import get_clip_params
+from tools.waveform_plot import draw_waveform_plot
+from tools.params_plot import draw_params_plot
+from audio_core.frequency_features import compute_frequency_features, compute_spectrogram, compute_cepstral_pitch
+from frequency_plots import plot_spectrogram, plot_pitch_track
+
+# Performance benchmarks of the analysis and plotting functions. Every case is
+# timed (best of --repeat runs, inputs are prepared outside the timing), run
+# once more under tracemalloc for the peak memory, and plotting cases also
+# record the size of the figure JSON. Runs are appended to a JSON history and
+# compared against a stored baseline:
+#
+#   python benchmarks/run_benchmarks.py                       # quick suite
+#   python benchmarks/run_benchmarks.py --suite full --save-baseline
+#   python benchmarks/run_benchmarks.py --time-threshold 0.1 --fail-on-regression
+#
+# A case regresses when a metric exceeds the baseline by more than its threshold
+# (a fraction, 0.25 = 25 % slower / larger).
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SUITES = {
+    'quick': {'durations': [1, 10, 60], 'sampling_rates': [16000, 44100], 'frame_sizes': [512, 2048]},
+    'full': {'durations': [1, 10, 60, 600, 3600], 'sampling_rates': [16000, 44100, 48000], 'frame_sizes': [256, 512, 1024, 2048]},
+}
+
+THRESHOLDS = {'silence_vol': 0.008, 'silence_zcr': 0.07, 'voiced_vol': 0.015, 'voiced_zcr': 0.05}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the time and frequency analysis functions.")
+    parser.add_argument("--suite", choices=SUITES, default='quick', help="signal durations, sampling rates and frame sizes to run")
+    parser.add_argument("--durations", type=float, nargs="+", help="synthetic signal durations in seconds, overrides the suite")
+    parser.add_argument("--sampling-rates", type=int, nargs="+", help="overrides the suite")
+    parser.add_argument("--frame-sizes", type=int, nargs="+", help="overrides the suite")
+    parser.add_argument("--no-examples", action="store_true", help="skip the bundled example_audio files")
+    parser.add_argument("--only", nargs="+", help="run only these benchmarks")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case, the fastest one is kept")
+    parser.add_argument("--history", default=os.path.join(BENCH_DIR, "history.json"), help="JSON file the run is appended to")
+    parser.add_argument("--baseline", default=os.path.join(BENCH_DIR, "baseline.json"), help="JSON file with the reference run")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25)
+    parser.add_argument("--memory-threshold", type=float, default=0.10)
+    parser.add_argument("--payload-threshold", type=float, default=0.05)
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 when a case regresses")
+    return parser.parse_args(argv)
+
+
+def synthetic_signal(duration, sampling_rate, seed=0):
+    # voiced segments with a gliding F0 and harmonics, separated by noise and
+    # silence, so every analysis path (voiced, unvoiced, silent) is exercised.
+    # Generated one second at a time with a running phase, the float64
+    # temporaries stay at one block even for hour-long signals.
+    rng = np.random.default_rng(seed)
+    n = int(duration * sampling_rate)
+    audio = np.empty(n, dtype=np.float32)
+    phase_offset = 0.0
+
+    for start in range(0, n, sampling_rate):
+        t = np.arange(start, min(start + sampling_rate, n)) / sampling_rate
+
+        f0 = 120 + 60 * np.sin(2 * np.pi * 0.3 * t)
+        phase = phase_offset + 2 * np.pi * np.cumsum(f0) / sampling_rate
+        # the harmonics are integer multiples, so the phase can wrap
+        phase_offset = phase[-1] % (2 * np.pi)
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+
+        # 1 s pattern: 0.5 s voiced, 0.3 s noise, 0.2 s silence
+        position = t % 1.0
+        audio[start:start + len(t)] = np.where(position < 0.5, 0.3 * voiced,
+                                               np.where(position < 0.8, 0.05 * rng.standard_normal(len(t)), 0.0))
+    return audio
+
+
+def load_signals(options, suite):
+    # yields (signal name, audio, sampling rate)
+    if not options.no_examples:
+        for path in sorted(glob.glob(os.path.join(ROOT, "example_audio", "**", "*.wav"), recursive=True)):
+            audio, sampling_rate = load_wav(path)
+            yield "example/" + os.path.relpath(path, os.path.join(ROOT, "example_audio")), audio, sampling_rate
+
+    for sampling_rate in options.sampling_rates or suite['sampling_rates']:
+        for duration in options.durations or suite['durations']:
+            yield f"synthetic/{duration:g}s@{sampling_rate}", synthetic_signal(duration, sampling_rate), sampling_rate
+
+
+# name -> (setup(audio, sampling_rate, frame_size) returning the measured call, uses frame_size);
+# plotting benchmarks return the figure from the call
+BENCHMARKS = {}
+
+def benchmark(name, framed=True):
+    def register(setup):
+        BENCHMARKS[name] = (setup, framed)
+        return setup
+    return register
+
+
+def default_params(audio, sampling_rate):
+    return get_audio_params(audio, sampling_rate, 512, 256, THRESHOLDS['silence_vol'], THRESHOLDS['silence_zcr'], THRESHOLDS['voiced_vol'], THRESHOLDS['voiced_zcr'])
+
+
+@benchmark('get_audio_params')
+def _audio_params(audio, sampling_rate, frame_size):
+    return lambda: get_audio_params(audio, sampling_rate, frame_size, frame_size // 2, THRESHOLDS['silence_vol'], THRESHOLDS['silence_zcr'], THRESHOLDS['voiced_vol'], THRESHOLDS['voiced_zcr'])
+
+
+@benchmark('get_clip_params')
+def _clip_params(audio, sampling_rate, frame_size):
+    return lambda: get_clip_params(audio, sampling_rate, frame_size, frame_size // 2)
+
+
+@benchmark('compute_frequency_features')
+def _frequency_features(audio, sampling_rate, frame_size):
+    return lambda: compute_frequency_features(audio, sampling_rate, frame_size, frame_size // 2)
+
+
+@benchmark('compute_spectrogram')
+def _spectrogram(audio, sampling_rate, frame_size):
+    return lambda: compute_spectrogram(audio, sampling_rate, frame_size, frame_size // 2)
+
+
+@benchmark('compute_cepstral_pitch')
+def _cepstral_pitch(audio, sampling_rate, frame_size):
+    return lambda: compute_cepstral_pitch(audio, sampling_rate, frame_size, frame_size // 2)
+
+
+@benchmark('draw_waveform_plot', framed=False)
+def _waveform_plot(audio, sampling_rate, frame_size):
+    params = default_params(audio, sampling_rate)
+
+    def run():
+        fig = go.Figure()
+        draw_waveform_plot(audio, sampling_rate, fig, params, "Silence")
+        return fig
+    return run
+
+
+@benchmark('draw_params_plot', framed=False)
+def _params_plot(audio, sampling_rate, frame_size):
+    params = default_params(audio, sampling_rate)
+
+    def run():
+        fig = go.Figure()
+        draw_params_plot(audio, sampling_rate, "Volume", fig, params)
+        return fig
+    return run
+
+
+@benchmark('plot_spectrogram')
+def _spectrogram_plot(audio, sampling_rate, frame_size):
+    freqs, times, spec = compute_spectrogram(audio, sampling_rate, frame_size, frame_size // 2)
+    return lambda: plot_spectrogram(freqs, times, spec)
+
+
+@benchmark('plot_pitch_track')
+def _pitch_plot(audio, sampling_rate, frame_size):
+    times, f0_values, _ = compute_cepstral_pitch(audio, sampling_rate, frame_size, frame_size // 2)
+    return lambda: plot_pitch_track(times, f0_values)
+
+
+def measure(setup, audio, sampling_rate, frame_size, repeat):
+    call = setup(audio, sampling_rate, frame_size)
+
+    # warm-up, first calls pay for lazy imports, JIT compilation and FFT plans
+    call()
+
+    # serializing the figure is part of what a plotting call costs
+    wall = float('inf')
+    payload = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = call()
+        if isinstance(output, go.Figure):
+            payload = len(output.to_json())
+        wall = min(wall, time.perf_counter() - start)
+
+    tracemalloc.start()
+    output = call()
+    if isinstance(output, go.Figure):
+        output.to_json()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {'wall_s': wall, 'peak_bytes': peak}
+    if payload is not None:
+        result['payload_bytes'] = payload
+    return result
+
+
+def run_suite(options):
+    suite = SUITES[options.suite]
+    names = options.only or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    examples = {}
+    for signal, audio, sampling_rate in load_signals(options, suite):
+        for name in names:
+            setup, framed = BENCHMARKS[name]
+            for frame_size in (options.frame_sizes or suite['frame_sizes']) if framed else [None]:
+                result = measure(setup, audio, sampling_rate, frame_size or 512, options.repeat)
+
+                # the example files are short, they are reported summed per benchmark and frame size
+                if signal.startswith("example/"):
+                    case = f"{name}/example_audio" + (f"/fs{frame_size}" if framed else "")
+                    total = examples.setdefault(case, {key: 0 for key in result})
+                    for key, value in result.items():
+                        total[key] = total[key] + value if key != 'peak_bytes' else max(total[key], value)
+                    continue
+
+                case = f"{name}/{signal}" + (f"/fs{frame_size}" if framed else "")
+                results[case] = result
+                print(f"{case:<60} {format_result(result)}", file=sys.stderr)
+
+    for case, result in examples.items():
+        print(f"{case:<60} {format_result(result)}", file=sys.stderr)
+    results.update(examples)
+    return results
+
+
+def format_result(result):
+    text = f"{result['wall_s'] * 1000:10.1f} ms {result['peak_bytes'] / 2**20:9.1f} MiB"
+    if 'payload_bytes' in result:
+        text += f" {result['payload_bytes'] / 1024:9.1f} KiB"
+    return text
+
+
+def run_info():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, thresholds):
+    # returns [(case, metric, baseline value, new value)] of the regressions
+    regressions = []
+    for case, result in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        for metric, threshold in thresholds.items():
+            if metric in result and reference.get(metric):
+                if result[metric] > reference[metric] * (1 + threshold):
+                    regressions.append((case, metric, reference[metric], result[metric]))
+    return regressions
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    run = dict(run_info(), suite=options.suite, results=run_suite(options))
+
+    history = []
+    if os.path.exists(options.history):
+        with open(options.history) as f:
+            history = json.load(f)
+    history.append(run)
+    with open(options.history, "w") as f:
+        json.dump(history, f, indent=1)
+
+    regressions = []
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+        thresholds = {'wall_s': options.time_threshold, 'peak_bytes': options.memory_threshold, 'payload_bytes': options.payload_threshold}
+        regressions = compare(run['results'], baseline['results'], thresholds)
+
+        print(f"\ncompared with baseline {baseline.get('commit', '')} ({baseline.get('timestamp', '')}): {len(regressions)} regressions", file=sys.stderr)
+        for case, metric, before, after in regressions:
+            print(f"  {case} {metric}: {before:.4g} -> {after:.4g} ({after / before - 1:+.0%})", file=sys.stderr)
+
+    if options.save_baseline:
+        with open(options.baseline, "w") as f:
+            json.dump(run, f, indent=1)
+        print(f"saved baseline {options.baseline}", file=sys.stderr)
+
+    if regressions and options.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from audio_core.feature_cache import DEFAULT_DIR, cached, file_digest, get_cache
+from audio_core.feature_index import VECTOR_FIELDS, FeatureIndex, summarize
+from audio_core.wav import find_files, load_wav
+
+# Nearest-neighbour search over a corpus of WAV files, see audio_core.feature_index:
+#
+#   python corpus_index.py add example_audio --index corpus_index
+#   python corpus_index.py query example_audio/Znormalizowane/jeden_1.wav -k 3
+#   python corpus_index.py similar -k 1
+#   python corpus_index.py remove example_audio/Nieznormalizowane
+#
+# Files are identified by their absolute path. Summaries go through the
+# feature cache shared with the apps, re-adding an unchanged file only loads it.
+# The index records the --frame-size and --frame-step of its vectors, adds and
+# queries with other values are refused.
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Similarity index of WAV recordings.")
+    parser.add_argument("--index", default="corpus_index", help="index directory")
+    parser.add_argument("--cache-dir", default=os.environ.get('AUDIO_FEATURE_CACHE', DEFAULT_DIR), help="feature cache directory")
+    parser.add_argument("--cache-size-mb", type=float, default=2048, help="size cap of the feature cache")
+    parser.add_argument("--no-cache", action="store_true", help="neither read nor write the feature cache")
+    parser.add_argument("--frame-size", type=int, default=512)
+    parser.add_argument("--frame-step", type=int, default=256)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="summarize files and add (or update) them")
+    add.add_argument("paths", nargs="+", help="WAV files or directories searched recursively")
+    add.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+
+    remove = commands.add_parser("remove", help="remove files from the index")
+    remove.add_argument("paths", nargs="+")
+
+    query = commands.add_parser("query", help="nearest indexed files of the given files")
+    query.add_argument("paths", nargs="+", help="indexed or new WAV files")
+    query.add_argument("-k", type=int, default=5)
+
+    similar = commands.add_parser("similar", help="nearest neighbours of every indexed file")
+    similar.add_argument("-k", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def summary_params(options):
+    return {'frame_size': options.frame_size, 'frame_step': options.frame_step}
+
+
+def check_params(index, options):
+    # exits when the indexed vectors were summarized with other options, an
+    # empty index takes the current ones
+    current = summary_params(options)
+    if not len(index):
+        index.params = current
+        return
+
+    changed = [name for name in current if index.params.get(name) != current[name]]
+    if changed:
+        recorded = ', '.join(f"{name}={index.params.get(name)}" for name in current)
+        sys.exit(f"the vectors in {options.index} were made with other options ({recorded}), "
+                 f"run with those or use a new --index")
+
+
+def summarize_file(path, options):
+    def compute():
+        audio, sampling_rate = load_wav(path)
+        return summarize(audio, sampling_rate, options.frame_size, options.frame_step)
+
+    try:
+        cache = None if options.no_cache else get_cache(options.cache_dir, int(options.cache_size_mb * 2**20))
+        digest = file_digest(path) if cache is not None else None
+        params = dict(summary_params(options), fields=VECTOR_FIELDS)
+        return path, cached(cache, 'summary', digest, params, compute), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def summarize_files(files, options, workers=1):
+    if workers == 1 or len(files) <= 1:
+        results = [summarize_file(path, options) for path in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(summarize_file, files, [options] * len(files)))
+
+    vectors = {}
+    for path, vector, error in results:
+        if error:
+            print(f"FAILED {path}: {error}", file=sys.stderr)
+        else:
+            vectors[path] = vector
+    return vectors
+
+
+def print_neighbours(paths, ids, distances):
+    for path, neighbours, row in zip(paths, ids, distances):
+        print(path)
+        for neighbour, distance in zip(neighbours, row):
+            print(f"  {distance:8.3f}  {neighbour}")
+
+
+def main(argv=None):
+    options = parse_args(argv)
+
+    with FeatureIndex(options.index, params=summary_params(options)) as index:
+        if options.command == "add":
+            check_params(index, options)
+            files = find_files(options.paths)
+            vectors = summarize_files(files, options, options.workers)
+            if vectors:
+                index.add(list(vectors), list(vectors.values()))
+            print(f"added {len(vectors)} files, {len(index)} in the index", file=sys.stderr)
+
+        elif options.command == "remove":
+            removed = index.remove(find_files(options.paths))
+            print(f"removed {removed} files, {len(index)} in the index", file=sys.stderr)
+
+        elif options.command == "query":
+            check_params(index, options)
+            files = [os.path.abspath(path) for path in options.paths]
+            indexed = [path for path in files if path in index]
+            vectors = summarize_files([path for path in files if path not in index], options)
+            vectors.update(zip(indexed, index.vectors(indexed)))
+            files = [path for path in files if path in vectors]
+            if not files:
+                sys.exit(1)
+
+            # indexed files are not their own neighbours
+            exclude = [index.rows.get(path) for path in files]
+            ids, distances = index.query([vectors[path] for path in files], options.k, exclude_rows=exclude)
+            print_neighbours(files, ids, distances)
+
+        elif options.command == "similar":
+            files = [id_ for id_ in index.ids if id_ is not None]
+            ids, distances = index.query_ids(files, options.k)
+            print_neighbours(files, ids, distances)
+
+
+if __name__ == "__main__":
+    main()
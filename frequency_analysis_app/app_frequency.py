@@ -1,9 +1,47 @@
+import os
+import sys
+from functools import partial
+import numpy as np
 import streamlit as st
-import librosa
 import plotly.graph_objects as go
-from frequency_features import *
+
+# shared audio_core package lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_core import profiling
+from audio_core.columnar_io import available_formats, download_name
+from audio_core.feature_cache import content_digest, default_cache
+from audio_core.wav import load_wav
+from audio_core.waveform import WaveformPyramid
+from audio_core.feature_graph import FeatureGraph
+from frequency_export import export_metadata, export_features, export_spectrogram
 from frequency_plots import *
 
+# decoded once per upload, WAV data is wrapped without copying, other formats go through librosa
+@st.cache_resource(max_entries=8)
+def load_audio(audio_hash, _uploaded_file):
+    return load_wav(_uploaded_file)
+
+@st.cache_resource(max_entries=8)
+def load_waveform_pyramid(audio_hash, _audio, sampling_rate):
+    return WaveformPyramid(_audio, sampling_rate)
+
+# results on disk, shared with the time app and the batch runner, see audio_core.feature_cache
+@st.cache_resource
+def load_disk_cache():
+    return default_cache()
+
+@st.cache_resource(max_entries=8)
+def load_feature_graph(audio_hash, _audio, sampling_rate):
+    return FeatureGraph(_audio, sampling_rate, disk_cache=load_disk_cache(), audio_digest=audio_hash)
+
+def show_profile(profile):
+    st.sidebar.subheader("Performance profile")
+    if profile.memory_refused:
+        st.sidebar.caption("Memory is being traced by another session, peaks are not shown.")
+    st.sidebar.dataframe(profile.rows(), hide_index=True)
+    st.sidebar.download_button("Download profile (JSON)", profile.to_json(), file_name="profile.json", mime="application/json")
+
 class AudioAnalyzerApp:
     def __init__(self):
         self.audio = None
@@ -14,28 +52,58 @@ class AudioAnalyzerApp:
 
     def main(self):
         st.set_page_config(page_title="Audio Analyser", page_icon="🎵")
+
+        # optional per-stage timings of the rerun, shown at the bottom of the sidebar
+        profile_run = st.sidebar.checkbox("Profile this run")
+        trace_memory = profile_run and st.sidebar.checkbox("Trace memory (slower)")
+        with profiling.session(profile_run, trace_memory) as profile:
+            self.analyze()
+        if profile is not None:
+            show_profile(profile)
+
+    def analyze(self):
         st.title("🎵 Audio Analyser - frequency")
 
         uploaded_file = st.file_uploader("Upload a WAV file", type=["wav"])
 
         if uploaded_file is not None:
-            self.audio, self.sampling_rate = librosa.load(uploaded_file, sr=None)
+            with profiling.stage("load audio"):
+                audio_hash = content_digest(uploaded_file.getvalue())
+                self.audio, self.sampling_rate = load_audio(audio_hash, uploaded_file)
+            with profiling.stage("waveform pyramid"):
+                pyramid = load_waveform_pyramid(audio_hash, self.audio, self.sampling_rate)
+            # spectra, features and pitch are shared between the sections below and across reruns
+            graph = load_feature_graph(audio_hash, self.audio, self.sampling_rate)
 
             st.audio(uploaded_file, format="audio/wav")
 
             ########### WAVEFORM PLOT ##########
             st.subheader("Waveform Plot")
-            fig_waveform = plot_time_waveform(self.audio, 0, len(self.audio) / self.sampling_rate, self.sampling_rate)
-            st.plotly_chart(fig_waveform, key='waveform')
+            fig_waveform = plot_time_waveform(self.audio, 0, len(self.audio) / self.sampling_rate, self.sampling_rate, pyramid=pyramid)
+            with profiling.stage("render waveform"):
+                st.plotly_chart(fig_waveform, key='waveform')
 
             ########### FREQUENCY FEATURES ##########
             st.subheader("Frequency Features")
-            freq_features = compute_frequency_features(self.audio, self.sampling_rate, self.frame_size, self.frame_step)
+            freq_features = graph.get('frequency_features', frame_size=self.frame_size, frame_step=self.frame_step)
             feature_options = ["Volume", "Frequency Centroid", "Bandwidth", "ERSB", "Spectral Flatness", "Spectral Crest"]
 
             selected_feature = st.selectbox("Select frequency-domain feature to display", feature_options)
             fig_feature = plot_frequency_feature(freq_features, selected_feature)
-            st.plotly_chart(fig_feature, key='frequency_feature')
+            with profiling.stage("render frequency feature"):
+                st.plotly_chart(fig_feature, key='frequency_feature')
+
+            # files are only generated when their button is clicked
+            # frames are centered on multiples of the step
+            feature_times = np.arange(len(freq_features["Volume"])) * self.frame_step / self.sampling_rate
+            feature_metadata = export_metadata(self.audio, self.sampling_rate, self.frame_size, self.frame_step, 'hann')
+            for column, fmt in zip(st.columns(len(available_formats())), available_formats()):
+                file_name, mime = download_name("frequency_features", fmt, len(feature_times))
+                column.download_button(label=f"Download features ({fmt.upper()})",
+                                       data=partial(export_features, feature_times, freq_features, feature_metadata, fmt),
+                                       file_name=file_name,
+                                       mime=mime,
+                                       key=f'features_{fmt}')
 
             ########### FFT ##########
             st.subheader("FFT and Windowing")
@@ -74,21 +142,25 @@ class AudioAnalyzerApp:
 
             col1, col2 = st.columns(2)
             with col1:
-                fig_time_no_window = plot_time_waveform(self.audio, start_time, frame_length_sec, self.sampling_rate, title="Time (No Window)")
-                st.plotly_chart(fig_time_no_window, key='time_no_window')
+                fig_time_no_window = plot_time_waveform(self.audio, start_time, frame_length_sec, self.sampling_rate, title="Time (No Window)", pyramid=pyramid)
+                with profiling.stage("render time no window"):
+                    st.plotly_chart(fig_time_no_window, key='time_no_window')
 
             with col2:
                 fig_time_window = plot_time_waveform(self.audio, start_time, frame_length_sec, self.sampling_rate, title="Time (With Window)", with_window=True, window_type=window_type)
-                st.plotly_chart(fig_time_window, key='time_window')
+                with profiling.stage("render time window"):
+                    st.plotly_chart(fig_time_window, key='time_window')
 
             col3, col4 = st.columns(2)
             with col3:
                 fig_freq_no_window = plot_fft(self.audio, self.sampling_rate, start_time, frame_length_sec)
-                st.plotly_chart(fig_freq_no_window, key='fft_no_window')
+                with profiling.stage("render fft no window"):
+                    st.plotly_chart(fig_freq_no_window, key='fft_no_window')
 
             with col4:
                 fig_freq_window = plot_fft(self.audio, self.sampling_rate, start_time, frame_length_sec, window_type=window_type, window=True)
-                st.plotly_chart(fig_freq_window, key='fft_window')
+                with profiling.stage("render fft window"):
+                    st.plotly_chart(fig_freq_window, key='fft_window')
 
 
             ########### SPECTROGRAM ##########
@@ -104,16 +176,28 @@ class AudioAnalyzerApp:
 
             spec_frame_step = int(spec_frame_size * (1 - overlap_percent / 100))
 
-            freqs, times, spec = compute_spectrogram(
-                self.audio,
-                self.sampling_rate,
+            freqs, times, spec = graph.get(
+                'spectrum',
                 frame_size=spec_frame_size,
                 frame_step=spec_frame_step,
                 window_type=spec_window_type
             )
 
-            fig_spectrogram = plot_spectrogram(freqs, times, spec)
-            st.plotly_chart(fig_spectrogram, key='spectrogram')
+            spec_as_image = st.checkbox("Render spectrogram as image (smaller, faster for long files)")
+            fig_spectrogram = plot_spectrogram(freqs, times, spec, as_image=spec_as_image)
+            with profiling.stage("render spectrogram"):
+                st.plotly_chart(fig_spectrogram, key='spectrogram')
+
+            spec_formats = [fmt for fmt in available_formats() if fmt != 'txt']
+            spec_metadata = export_metadata(self.audio, self.sampling_rate, spec_frame_size, spec_frame_step, spec_window_type)
+            for column, fmt in zip(st.columns(len(spec_formats)), spec_formats):
+                # NPZ keeps the whole matrix in one file
+                file_name, mime = download_name("spectrogram", fmt, len(times) if fmt != 'npz' else 0)
+                column.download_button(label=f"Download spectrogram ({fmt.upper()})",
+                                       data=partial(export_spectrogram, freqs, times, spec, spec_metadata, fmt),
+                                       file_name=file_name,
+                                       mime=mime,
+                                       key=f'spectrogram_{fmt}')
 
             ########### FUNDAMENTAL FREQUENCY - CEPSTRUM ##########
             st.subheader("Fundamental Frequency (Cepstrum Method)")
@@ -125,24 +209,35 @@ class AudioAnalyzerApp:
             with colR:
                 min_f0 = st.number_input("Minimum F0 (Hz)", min_value=20, max_value=100, value=50)
                 max_f0 = st.number_input("Maximum F0 (Hz)", min_value=100, max_value=500, value=400)
+                min_prominence = st.slider("Minimum cepstral peak prominence", 0.0, 10.0, 0.0, step=0.5)
+                cepstrum_mode = st.radio("Global cepstrum", ["Full signal", "Averaged over frames"], horizontal=True)
 
             f0_step = int(f0_frame_size * (1 - f0_overlap / 100))
 
-            times, f0_values = compute_cepstral_pitch(
-                self.audio,
-                self.sampling_rate,
+            # floats like the --f0-min/--f0-max of batch_analysis.py, 50 and 50.0 are different cache keys
+            times, f0_values, prominence = graph.get(
+                'pitch',
                 frame_size=f0_frame_size,
                 frame_step=f0_step,
-                f0_min=min_f0,
-                f0_max=max_f0
+                f0_min=float(min_f0),
+                f0_max=float(max_f0)
             )
-
-            quefrency, cepstrum = compute_global_cepstrum(self.audio, self.sampling_rate)
+            # frames with a weak cepstral peak are treated as unvoiced
+            f0_values = np.where(prominence >= min_prominence, f0_values, 0.0)
+
+            if cepstrum_mode == "Full signal":
+                quefrency, cepstrum = graph.get('global_cepstrum', mode='full', frame_size=None)
+            else:
+                # the frames have to hold at least two periods of the lowest F0
+                cepstrum_frame_size = 1 << int(np.ceil(np.log2(2 * self.sampling_rate / min_f0 + 2)))
+                quefrency, cepstrum = graph.get('global_cepstrum', mode='averaged', frame_size=cepstrum_frame_size)
             fig_cepstrum_global = plot_global_cepstrum(quefrency, cepstrum, min_f0, max_f0, self.sampling_rate)
-            st.plotly_chart(fig_cepstrum_global, key='cepstrum_global')
+            with profiling.stage("render cepstrum global"):
+                st.plotly_chart(fig_cepstrum_global, key='cepstrum_global')
 
             fig_pitch = plot_pitch_track(times, f0_values)
-            st.plotly_chart(fig_pitch, key='pitch_track')
+            with profiling.stage("render pitch track"):
+                st.plotly_chart(fig_pitch, key='pitch_track')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+import io
+import numpy as np
+from audio_core.columnar_io import export_bytes, write_npz
+from audio_core.profiling import profiled
+
+def export_metadata(audio, sampling_rate, frame_size, frame_step, window_type):
+    # written once per file, not repeated in every row
+    return {
+        "Sampling Rate": sampling_rate,
+        "Frame Size": frame_size,
+        "Frame Step": frame_step,
+        "Window": window_type,
+        "Duration": len(audio) / sampling_rate,
+    }
+
+
+@profiled()
+def export_features(times, freq_features, metadata, fmt='csv'):
+    columns = {"Frame": np.arange(1, len(times) + 1), "Time": times}
+    columns.update(freq_features)
+
+    return export_bytes("frequency_features", columns, metadata, fmt)
+
+
+@profiled()
+def export_spectrogram(freqs, times, spec, metadata, fmt='csv'):
+    # NPZ keeps the (frequencies, frames) matrix, the row formats get one row
+    # per frame and one column per frequency bin (parts for long recordings)
+    if fmt == 'npz':
+        buffer = io.BytesIO()
+        write_npz(buffer, {"Time": times, "Frequency": freqs, "Magnitude": spec}, metadata)
+        return buffer.getvalue()
+
+    columns = {"Time": times}
+    columns.update((f"{freq:g} Hz", spec[i]) for i, freq in enumerate(freqs))
+
+    return export_bytes("spectrogram", columns, metadata, fmt)
@@ -1,10 +1,26 @@
-from frequency_features import apply_window, compute_fft
+from audio_core.frequency_features import apply_window, compute_fft
+from audio_core.waveform import WaveformPyramid, minmax_decimate
+import base64
+import io
 import numpy as np
+import plotly.colors
 import plotly.graph_objects as go
+from audio_core.profiling import profiled
 
-def draw_waveform_plot(audio, sampling_rate, fig):
-    time = np.linspace(0, len(audio) / sampling_rate, len(audio))
-    fig.add_trace(go.Scatter(x=time, y=audio, mode='lines', name='Waveform', line=dict(color='#1f77b4')))
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# 256 entry RGB table for colormapped spectrogram images
+VIRIDIS_LUT = np.array([plotly.colors.unlabel_rgb(color) for color in plotly.colors.sample_colorscale('Viridis', np.linspace(0, 1, 256))], dtype=np.uint8)
+
+@profiled()
+def draw_waveform_plot(audio, sampling_rate, fig, pyramid=None):
+    if pyramid is None:
+        pyramid = WaveformPyramid(audio, sampling_rate)
+    time, envelope = pyramid.envelope()
+    fig.add_trace(go.Scatter(x=time, y=envelope, mode='lines', name='Waveform', line=dict(color='#1f77b4')))
 
     fig.update_layout(
         xaxis_title="Time [s]",
@@ -24,15 +40,26 @@ def draw_waveform_plot(audio, sampling_rate, fig):
         plot_bgcolor='white'
     )
 
-def plot_time_waveform(audio, start_time, frame_length_sec, sampling_rate, title="Time Plot", with_window=False, window_type=None):
+@profiled()
+def plot_time_waveform(audio, start_time, frame_length_sec, sampling_rate, title="Time Plot", with_window=False, window_type=None, pyramid=None):
     fig = go.Figure()
-    frame_audio = audio[int(start_time * sampling_rate):int(start_time * sampling_rate + frame_length_sec * sampling_rate)]
-    
-    if with_window:
-        frame_audio = apply_window(frame_audio, window_type)
-    
+
+    # min/max envelope instead of every sample, the windowed frame is
+    # decimated directly, the plain one comes from the precomputed pyramid
+    if with_window or pyramid is None:
+        frame_audio = audio[int(start_time * sampling_rate):int(start_time * sampling_rate + frame_length_sec * sampling_rate)]
+
+        if with_window:
+            frame_audio = apply_window(frame_audio, window_type)
+
+        positions, frame_audio = minmax_decimate(frame_audio)
+        time = positions / sampling_rate
+    else:
+        time, frame_audio = pyramid.envelope(start_time, start_time + frame_length_sec)
+        time = time - start_time
+
     fig.add_trace(go.Scatter(
-        x=np.arange(len(frame_audio)) / sampling_rate,
+        x=time,
         y=frame_audio, 
         mode="lines"
     ))
@@ -40,6 +67,7 @@ def plot_time_waveform(audio, start_time, frame_length_sec, sampling_rate, title
     fig.update_layout(title=f"Time {'(With Window: ' + window_type + ')' if with_window else '(No Window)'}", xaxis_title="Time (s)", yaxis_title="Amplitude")
     return fig
 
+@profiled()
 def plot_fft(audio, sampling_rate, start_time, frame_length_sec, window_type=None, window=False):
     if window:
         freq, mag = compute_fft(audio, sampling_rate, start_time, frame_length_sec, window_type)
@@ -56,6 +84,7 @@ def plot_fft(audio, sampling_rate, start_time, frame_length_sec, window_type=Non
     )
     return fig
 
+@profiled()
 def plot_frequency_feature(freq_features, selected_feature):
     fig = go.Figure()
     if selected_feature == "ERSB":
@@ -69,25 +98,75 @@ def plot_frequency_feature(freq_features, selected_feature):
     fig.update_layout(xaxis_title="Frame", yaxis_title="Value")
     return fig
 
-def plot_spectrogram(freqs, times, spec, db_scale=True):
+@profiled()
+def plot_spectrogram(freqs, times, spec, db_scale=True, f_max=5000, max_width=1500, as_image=False):
+    # only the displayed band is converted and sent, frames are max-pooled down
+    # to max_width columns, so the payload does not grow with the duration
+    n_bins = np.searchsorted(freqs, f_max, side='right')
+    freqs = freqs[:n_bins]
+    spec = spec[:n_bins]
+
+    if spec.shape[1] > max_width:
+        pool = -(-spec.shape[1] // max_width)
+        starts = np.arange(0, spec.shape[1], pool)
+        spec = np.maximum.reduceat(spec, starts, axis=1)
+        times = times[starts]
+
     if db_scale:
         spec = 10 * np.log10(spec + 1e-10)
 
-    fig = go.Figure(data=go.Heatmap(
-        z=spec,
-        x=times,
-        y=freqs,
-        colorscale='Viridis',
-        colorbar=dict(title="Magnitude (dB)" if db_scale else "Magnitude"),
-    ))
+    colorbar = dict(title="Magnitude (dB)" if db_scale else "Magnitude")
+
+    if as_image and spec.size > 0:
+        fig = go.Figure(_spectrogram_image(freqs, times, spec, colorbar))
+    else:
+        fig = go.Figure(data=go.Heatmap(
+            z=spec,
+            x=times,
+            y=freqs,
+            colorscale='Viridis',
+            colorbar=colorbar,
+        ))
 
     fig.update_layout(
         xaxis_title="Time (s)",
         yaxis_title="Frequency (Hz)",
-        yaxis=dict(range=[0, 5000])
+        yaxis=dict(range=[0, f_max])
     )
     return fig
 
+def _spectrogram_image(freqs, times, spec, colorbar):
+    # uint8 RGB pixels through a Viridis lookup table, lowest frequency in the first row
+    low, high = float(np.min(spec)), float(np.max(spec))
+    scaled = (spec - low) * (255 / (high - low)) if high > low else np.zeros(spec.shape)
+    pixels = VIRIDIS_LUT[scaled.astype(np.uint8)]
+
+    # PNG compresses the pixels further, the raw array is sent without Pillow
+    if Image is not None:
+        png = io.BytesIO()
+        Image.fromarray(pixels).save(png, format='PNG')
+        pixel_data = dict(source='data:image/png;base64,' + base64.b64encode(png.getvalue()).decode())
+    else:
+        pixel_data = dict(z=pixels)
+
+    image = go.Image(
+        **pixel_data,
+        x0=times[0],
+        dx=times[1] - times[0] if len(times) > 1 else 1,
+        y0=freqs[0],
+        dy=freqs[1] - freqs[0] if len(freqs) > 1 else 1,
+    )
+    # images have no colorbar of their own, an empty trace carries the scale
+    scale = go.Scatter(
+        x=[None],
+        y=[None],
+        mode='markers',
+        showlegend=False,
+        marker=dict(colorscale='Viridis', cmin=low, cmax=high, color=[low], showscale=True, colorbar=colorbar),
+    )
+    return [image, scale]
+
+@profiled()
 def plot_pitch_track(times, f0_values):
     fig = go.Figure()
     fig.add_trace(go.Scatter(
@@ -106,6 +185,7 @@ def plot_pitch_track(times, f0_values):
     )
     return fig
 
+@profiled()
 def plot_global_cepstrum(quefrency, cepstrum, f0_min=50, f0_max=400, sr=22050):
     # Oblicz zakres quefrency do zachowania (domyślnie 1/f0_max do 1/f0_min)
     min_q = 1 / f0_max
@@ -0,0 +1,375 @@
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import sys
+import traceback
+
+import numpy as np
+
+from audio_core.parallel import get_pool, resolve_workers
+from audio_core.streaming import FrameBuffer
+from audio_core.wav import load_wav
+from audio_core.audio_params import get_audio_params
+from audio_core.frequency_features import fft_frequencies, spectral_features, stft_magnitude
+
+# Live analysis of raw PCM streams. A client connects over TCP or a Unix
+# socket, sends one JSON header line and then raw samples until it closes its
+# sending side; the server answers with newline-delimited JSON, one line per
+# frame as soon as the frame is complete:
+#
+#   python ingest_server.py serve --port 8765
+#   python ingest_server.py send example.wav --port 8765 --realtime
+#
+# header:  {"sampling_rate": 16000, "format": "s16le", "channels": 1, "frame_size": 512, ...}
+# output:  {"type": "time", "frame": 0, "time": 0.0, "ste": ..., "silent": false, "voiced": true, "f0_yin": ...}
+#          {"type": "spectral", "frame": 0, "time": 0.0, "Volume": ..., "Frequency Centroid": ...}
+#          {"type": "end", "samples": ..., "time_frames": ..., "spectral_frames": ...}
+#
+# "time" lines carry the get_audio_params columns of frames starting at
+# frame * frame_step, "spectral" lines the compute_frequency_features set of
+# frames centred there. Time lines match the in-memory results of the whole
+# signal exactly, spectral lines up to the rounding of the per-frame sums.
+# The analysis of every stream runs on a shared thread pool. Lines go through a
+# bounded queue per stream, a consumer that reads slowly fills it and the
+# server stops reading that stream's socket until it catches up.
+
+# bytes read from a socket at once, bounds the samples analysed per step
+READ_SIZE = 1 << 16
+# analysed batches of lines waiting for the consumer per stream
+QUEUE_SIZE = 8
+
+SAMPLE_FORMATS = {
+    'f32le': (np.dtype('<f4'), 1.0),
+    's16le': (np.dtype('<i2'), 1 / 2**15),
+    's32le': (np.dtype('<i4'), 1 / 2**31),
+}
+
+HEADER_DEFAULTS = {
+    'stream': None,
+    'format': 'f32le',
+    'channels': 1,
+    'frame_size': 512,
+    'frame_step': 256,
+    'silence_vol_threshold': 0.008,
+    'silence_zcr_threshold': 0.07,
+    'voiced_vol_threshold': 0.015,
+    'voiced_zcr_threshold': 0.05,
+    'yin_threshold': None,
+}
+
+THRESHOLDS = ['silence_vol_threshold', 'silence_zcr_threshold', 'voiced_vol_threshold', 'voiced_zcr_threshold']
+
+TIME_COLUMNS = ['ste', 'volume', 'zcr', 'f0_autocorr', 'f0_amdf', 'f0_yin', 'yin_aperiodicity']
+
+
+class StreamError(ValueError):
+    pass
+
+
+def is_number(value):
+    # JSON true/false are ints to Python, NaN and Infinity are accepted by json.loads
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def error_line(message, stream=None):
+    record = {'type': 'error', 'message': message}
+    if stream is not None:
+        record = {'stream': stream, **record}
+    return json.dumps(record).encode() + b'\n'
+
+
+def parse_header(line):
+    try:
+        header = json.loads(line)
+    except ValueError as e:
+        raise StreamError(f"invalid header: {e}")
+    if not isinstance(header, dict):
+        raise StreamError("the header must be a JSON object")
+
+    unknown = set(header) - set(HEADER_DEFAULTS) - {'sampling_rate'}
+    if unknown:
+        raise StreamError(f"unknown header fields: {', '.join(sorted(unknown))}")
+    if 'sampling_rate' not in header:
+        raise StreamError("the header needs a sampling_rate")
+
+    options = dict(HEADER_DEFAULTS, **header)
+    if options['format'] not in SAMPLE_FORMATS:
+        raise StreamError(f"format must be one of {', '.join(SAMPLE_FORMATS)}")
+    for key in ('sampling_rate', 'channels', 'frame_size', 'frame_step'):
+        if not isinstance(options[key], int) or options[key] < 1:
+            raise StreamError(f"{key} must be a positive integer")
+    # checked here, the analysis would only fail on the first frames
+    for key in THRESHOLDS:
+        if not is_number(options[key]):
+            raise StreamError(f"{key} must be a number")
+    if options['yin_threshold'] is not None and not is_number(options['yin_threshold']):
+        raise StreamError("yin_threshold must be a number or null")
+
+    return options
+
+
+class LiveAnalysis:
+    # incremental analysis of one stream: bytes go in, NDJSON lines come out.
+    # The frame buffers only keep the overlap of the next frames.
+    def __init__(self, options):
+        self.options = options
+        self.stream = options['stream']
+        self.sampling_rate = options['sampling_rate']
+        self.frame_size = options['frame_size']
+        self.frame_step = options['frame_step']
+        self.dtype, self.scale = SAMPLE_FORMATS[options['format']]
+        self.frame_bytes = self.dtype.itemsize * options['channels']
+
+        self.pending = b''
+        self.samples = 0
+        self.time_framer = FrameBuffer(self.frame_size, self.frame_step)
+        # spectral frames are centred like compute_frequency_features, so that
+        # signal starts with frame_size // 2 zeros
+        self.spectral_framer = FrameBuffer(self.frame_size, self.frame_step)
+        self.spectral_framer.push(np.zeros(self.frame_size // 2, dtype=np.float32))
+        self.freqs = fft_frequencies(self.sampling_rate, self.frame_size)
+
+    def decode(self, data):
+        # mono float32, converted like audio_core.wav; a partial sample waits for the next read
+        data = self.pending + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self.pending = data[usable:]
+
+        raw = np.frombuffer(data, dtype=self.dtype, count=usable // self.dtype.itemsize)
+        samples = raw.astype(np.float32, copy=False)
+        if self.scale != 1.0:
+            samples = samples * np.float32(self.scale)
+        if self.options['channels'] > 1:
+            samples = samples.reshape(-1, self.options['channels']).mean(axis=1, dtype=np.float32)
+        return samples
+
+    def push(self, data):
+        samples = self.decode(data)
+        self.samples += len(samples)
+        return self.time_lines(samples) + self.spectral_lines(samples)
+
+    def finish(self):
+        lines = self.spectral_lines(np.zeros(self.frame_size // 2, dtype=np.float32))
+        lines.append(self.line({
+            'type': 'end',
+            'samples': self.samples,
+            'time_frames': self.time_framer.next_frame,
+            'spectral_frames': self.spectral_framer.next_frame,
+        }))
+        return lines
+
+    def time_lines(self, samples):
+        first_frame, segment = self.time_framer.push(samples)
+        if segment is None:
+            return []
+
+        options = self.options
+        params = get_audio_params(segment,
+                                  self.sampling_rate,
+                                  self.frame_size,
+                                  self.frame_step,
+                                  options['silence_vol_threshold'],
+                                  options['silence_zcr_threshold'],
+                                  options['voiced_vol_threshold'],
+                                  options['voiced_zcr_threshold'],
+                                  options['yin_threshold'])
+
+        columns = [params[name].tolist() for name in TIME_COLUMNS]
+        silent = params['silent_ratio'].tolist()
+        voiced = params['voiced_ratio'].tolist()
+
+        lines = []
+        for i, values in enumerate(zip(*columns)):
+            frame = first_frame + i
+            record = {'type': 'time', 'frame': frame, 'time': frame * self.frame_step / self.sampling_rate}
+            # NaN (e.g. the aperiodicity of frames YIN did not measure) is null in JSON
+            record.update((name, None if math.isnan(value) else value) for name, value in zip(TIME_COLUMNS, values))
+            record['silent'] = silent[i]
+            record['voiced'] = voiced[i]
+            lines.append(self.line(record))
+        return lines
+
+    def spectral_lines(self, samples):
+        first_frame, segment = self.spectral_framer.push(samples)
+        if segment is None:
+            return []
+
+        power_spectrum = stft_magnitude(segment, self.frame_size, self.frame_step, center=False)**2
+        features = spectral_features(power_spectrum, self.freqs)
+        names = list(features)
+
+        lines = []
+        for i, values in enumerate(zip(*(features[name].tolist() for name in names))):
+            frame = first_frame + i
+            record = {'type': 'spectral', 'frame': frame, 'time': frame * self.frame_step / self.sampling_rate}
+            record.update(zip(names, values))
+            lines.append(self.line(record))
+        return lines
+
+    def line(self, record):
+        if self.stream is not None:
+            record = {'stream': self.stream, **record}
+        return json.dumps(record).encode() + b'\n'
+
+
+class IngestServer:
+    def __init__(self, threads=None, read_size=READ_SIZE, queue_size=QUEUE_SIZE):
+        self.pool = get_pool(resolve_workers(threads))
+        self.read_size = read_size
+        self.queue_size = queue_size
+        self.served = itertools.count(1)
+
+    async def handle(self, reader, writer):
+        stream_number = next(self.served)
+        queue = asyncio.Queue(self.queue_size)
+        sender = asyncio.create_task(self.send_lines(queue, writer))
+        try:
+            await self.analyze(stream_number, reader, queue)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            await queue.put(None)
+            await sender
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def analyze(self, stream_number, reader, queue):
+        loop = asyncio.get_running_loop()
+
+        try:
+            options = parse_header(await reader.readline())
+        # also an overlong header line
+        except ValueError as e:
+            await queue.put([error_line(str(e))])
+            return
+        if options['stream'] is None:
+            options['stream'] = stream_number
+
+        try:
+            analysis = await loop.run_in_executor(self.pool, LiveAnalysis, options)
+            while True:
+                data = await reader.read(self.read_size)
+                if not data:
+                    break
+                lines = await loop.run_in_executor(self.pool, analysis.push, data)
+                if lines:
+                    # waits while the consumer is behind, the socket is not read meanwhile
+                    await queue.put(lines)
+
+            lines = await loop.run_in_executor(self.pool, analysis.finish)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            raise
+        except Exception as e:
+            # the client gets an "error" record instead of a stream that just stops,
+            # the traceback stays in the server log
+            traceback.print_exc()
+            await queue.put([error_line(f"analysis failed: {e!r}", options['stream'])])
+            return
+        await queue.put(lines)
+
+    async def send_lines(self, queue, writer):
+        # drains the queue even after the consumer went away, so analyze() never blocks on it
+        connected = True
+        while (lines := await queue.get()) is not None:
+            if not connected:
+                continue
+            writer.writelines(lines)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+
+    async def serve(self, host=None, port=None, path=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def send_audio(audio, sampling_rate, host=None, port=None, path=None, chunk_size=4096, realtime=False, **header):
+    # local client: streams mono float32 samples, yields the parsed output
+    # lines as they arrive, the last one is the "end" (or "error") record
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def send():
+        writer.write(json.dumps(dict(header, sampling_rate=sampling_rate, format='f32le', channels=1)).encode() + b'\n')
+        samples = np.asarray(audio, dtype='<f4')
+        for start in range(0, len(samples), chunk_size):
+            writer.write(samples[start:start + chunk_size].tobytes())
+            await writer.drain()
+            if realtime:
+                await asyncio.sleep(chunk_size / sampling_rate)
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    # sending and receiving run side by side, otherwise both ends could wait on full buffers
+    sender = asyncio.create_task(send())
+    try:
+        async for line in reader:
+            yield json.loads(line)
+        await sender
+    finally:
+        sender.cancel()
+        writer.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Live time and frequency analysis of raw PCM streams.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the ingest server")
+    serve.add_argument("--threads", type=int, default=None, help="analysis threads shared by all streams (default: one per CPU)")
+    serve.add_argument("--read-size", type=int, default=READ_SIZE, help="bytes read from a stream at once")
+    serve.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="analysed batches buffered per slow consumer")
+
+    send = commands.add_parser("send", help="stream a WAV file to a running server, print the NDJSON output")
+    send.add_argument("file")
+    send.add_argument("--chunk-size", type=int, default=4096, help="samples per write")
+    send.add_argument("--realtime", action="store_true", help="send at the pace of the audio")
+    send.add_argument("--frame-size", type=int, default=HEADER_DEFAULTS['frame_size'])
+    send.add_argument("--frame-step", type=int, default=HEADER_DEFAULTS['frame_step'])
+
+    for command in (serve, send):
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", metavar="PATH", help="use a Unix socket instead of TCP")
+    return parser.parse_args(argv)
+
+
+async def print_stream(options):
+    audio, sampling_rate = load_wav(options.file)
+    lines = send_audio(audio, sampling_rate, options.host, options.port, options.unix,
+                       chunk_size=options.chunk_size, realtime=options.realtime,
+                       frame_size=options.frame_size, frame_step=options.frame_step)
+    async for record in lines:
+        print(json.dumps(record), flush=True)
+
+
+def main(argv=None):
+    options = parse_args(argv)
+
+    if options.command == "send":
+        asyncio.run(print_stream(options))
+        return
+
+    server = IngestServer(options.threads, options.read_size, options.queue_size)
+    where = options.unix or f"{options.host}:{options.port}"
+    print(f"listening on {where}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve(options.host, options.port, options.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
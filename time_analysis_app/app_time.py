@@ -1,12 +1,75 @@
+import os
+import sys
+from functools import partial
+import numpy as np
 import streamlit as st
-import librosa
 import plotly.graph_objects as go
-from tools.audio_params import get_audio_params
-from tools.clip_params import get_clip_params
+
+# shared audio_core package lives in the repository root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio_core import profiling
+from audio_core.columnar_io import available_formats, download_name
+from audio_core.feature_cache import content_digest, default_cache
+from audio_core.wav import load_wav
+from audio_core.waveform import WaveformPyramid
+from audio_core.audio_params import get_audio_params, get_frame_features, fill_f0
+from audio_core.clip_params import get_clip_params, clip_params_arrays, clip_params_from_arrays
 from tools.waveform_plot import draw_waveform_plot
 from tools.params_plot import draw_params_plot
 from tools.export_data import export_data
 
+# decoded once per upload, WAV data is wrapped without copying, other formats go through librosa
+@st.cache_resource(max_entries=8)
+def load_audio(audio_hash, _uploaded_file):
+    return load_wav(_uploaded_file)
+
+@st.cache_resource(max_entries=8)
+def load_waveform_pyramid(audio_hash, _audio, sampling_rate):
+    return WaveformPyramid(_audio, sampling_rate)
+
+# results on disk, shared with the frequency app and the batch runner, see audio_core.feature_cache
+@st.cache_resource
+def load_disk_cache():
+    return default_cache()
+
+# features depend only on the file and the framing, so threshold changes reuse
+# them; the cached array is filled with F0 values as frames become voiced. With
+# the disk cache F0 is computed for every frame once and the complete features
+# are stored, a single entry per file and framing that no threshold invalidates
+@st.cache_resource(max_entries=8)
+def load_frame_features(audio_hash, _audio, sampling_rate, frame_size, frame_step):
+    disk_cache = load_disk_cache()
+    if disk_cache is None:
+        return get_frame_features(_audio, sampling_rate, frame_size, frame_step)
+
+    def compute():
+        features = get_frame_features(_audio, sampling_rate, frame_size, frame_step)
+        fill_f0(features, _audio, sampling_rate, frame_size, frame_step)
+        return features
+
+    features = disk_cache.fetch('frame_features', audio_hash, {'frame_size': frame_size, 'frame_step': frame_step}, compute)
+    # cached values are read-only, get_audio_params finds nothing left to fill
+    return np.array(features)
+
+@st.cache_data(max_entries=8)
+def load_clip_params(audio_hash, _audio, sampling_rate, frame_size, frame_step):
+    disk_cache = load_disk_cache()
+    if disk_cache is None:
+        return get_clip_params(_audio, sampling_rate, frame_size, frame_step)
+
+    params = {'frame_size': frame_size, 'frame_step': frame_step, 'clip_length': 1}
+    arrays = disk_cache.fetch('clip_params', audio_hash, params,
+                              lambda: clip_params_arrays(get_clip_params(_audio, sampling_rate, frame_size, frame_step)))
+    return clip_params_from_arrays(arrays)
+
+def show_profile(profile):
+    st.sidebar.subheader("Performance profile")
+    if profile.memory_refused:
+        st.sidebar.caption("Memory is being traced by another session, peaks are not shown.")
+    st.sidebar.dataframe(profile.rows(), hide_index=True)
+    st.sidebar.download_button("Download profile (JSON)", profile.to_json(), file_name="profile.json", mime="application/json")
+
 class AudioAnalyzerApp:
     def __init__(self):
         self.audio = None
@@ -18,16 +81,29 @@ class AudioAnalyzerApp:
         self.silence_zcr_threshold = 0.07
         self.voiced_vol_threshold = 0.015
         self.voiced_zcr_threshold = 0.05
+        self.yin_threshold = None
 
     def main(self):
         st.set_page_config(page_title="Audio Analyser", page_icon="🎵")
+
+        # optional per-stage timings of the rerun, shown at the bottom of the sidebar
+        profile_run = st.sidebar.checkbox("Profile this run")
+        trace_memory = profile_run and st.sidebar.checkbox("Trace memory (slower)")
+        with profiling.session(profile_run, trace_memory) as profile:
+            self.analyze()
+        if profile is not None:
+            show_profile(profile)
+
+    def analyze(self):
         st.title("🎵 Audio Analyser - time")
 
         uploaded_file = st.file_uploader("Upload a WAV file", type=["wav"])
 
         if uploaded_file is not None:
             # loading audio
-            self.audio, self.sampling_rate = librosa.load(uploaded_file, sr=None)
+            with profiling.stage("load audio"):
+                audio_hash = content_digest(uploaded_file.getvalue())
+                self.audio, self.sampling_rate = load_audio(audio_hash, uploaded_file)
 
             # playing audio
             st.audio(uploaded_file, format="audio/wav")
@@ -80,17 +156,25 @@ class AudioAnalyzerApp:
                 step=0.01,
                 format="%.2f",
             )
+
+            st.sidebar.markdown('<hr>', unsafe_allow_html=True)
+
+            use_yin_voicing = st.sidebar.checkbox("Use YIN confidence for Voiced Phones")
+            if use_yin_voicing:
+                self.yin_threshold = st.sidebar.slider(
+                    "Select YIN aperiodicity threshold for Voiced Phones",
+                    min_value=0.05,
+                    max_value=0.5,
+                    value=0.2,
+                    step=0.01,
+                    format="%.2f",
+                )
+            else:
+                self.yin_threshold = None
             # end sidebar
 
             # audio params
-            self.params = get_audio_params(self.audio, 
-                                       self.sampling_rate, 
-                                       self.frame_size, 
-                                       self.frame_step, 
-                                       self.silence_vol_threshold, 
-                                       self.silence_zcr_threshold, 
-                                       self.voiced_vol_threshold, 
-                                       self.voiced_zcr_threshold)
+            self.params = self.load_params(audio_hash)
 
             # waveform plot
             selected_wave_chart = st.selectbox(
@@ -100,29 +184,54 @@ class AudioAnalyzerApp:
                 selected_wave_chart = "Silence"
 
             fig_waveform = go.Figure()
-            draw_waveform_plot(self.audio, self.sampling_rate, fig_waveform, self.params, selected_wave_chart)
-            st.plotly_chart(fig_waveform)
+            with profiling.stage("waveform pyramid"):
+                pyramid = load_waveform_pyramid(audio_hash, self.audio, self.sampling_rate)
+            draw_waveform_plot(self.audio, self.sampling_rate, fig_waveform, self.params, selected_wave_chart, pyramid)
+            with profiling.stage("render waveform"):
+                st.plotly_chart(fig_waveform)
 
             # params plot
             selected_chart = st.selectbox(
-                "Select chart:", ["Volume", "Short Time Energy (STE)", "Zero Crossing Rate (ZCR)", "Fundamental Frequency (F0) - Autocorrelation", "Fundamental Frequency (F0) - AMDF"]
+                "Select chart:", ["Volume", "Short Time Energy (STE)", "Zero Crossing Rate (ZCR)", "Fundamental Frequency (F0) - Autocorrelation", "Fundamental Frequency (F0) - AMDF", "Fundamental Frequency (F0) - YIN"]
             )
             if selected_chart is None:
                 selected_chart = "Volume"
 
             fig_params = go.Figure()
             draw_params_plot(self.audio, self.sampling_rate, selected_chart, fig_params, self.params)
-            st.plotly_chart(fig_params)
+            with profiling.stage("render params"):
+                st.plotly_chart(fig_params)
             
             # clip parameters
             st.header("Parameters")
-            clip_params = get_clip_params(self.audio, self.sampling_rate, self.frame_size, self.frame_step)
-            st.dataframe(clip_params.round(3))
-
-            # export data
-            csv_file, txt_data = export_data(self.audio, self.sampling_rate, self.frame_size, self.frame_step, self.silence_vol_threshold, self.params)
-            st.download_button(label="Download CSV", data=csv_file.encode(), file_name="audio_params.csv", mime="text/csv")
-            st.download_button(label="Download TXT", data=txt_data.encode(), file_name="audio_params.txt", mime="text/plain")
+            with profiling.stage("clip params"):
+                clip_params = load_clip_params(audio_hash, self.audio, self.sampling_rate, self.frame_size, self.frame_step)
+                st.dataframe(clip_params.round(3))
+
+            # export data, each file is only generated when its button is clicked
+            for fmt in available_formats():
+                file_name, mime = download_name("audio_params", fmt, len(self.params))
+                st.download_button(label=f"Download {fmt.upper()}",
+                                   data=partial(export_data, self.audio, self.sampling_rate, self.frame_size, self.frame_step, self.silence_vol_threshold, self.params, fmt),
+                                   file_name=file_name,
+                                   mime=mime)
+
+
+    def load_params(self, audio_hash):
+        with profiling.stage("frame features"):
+            features = load_frame_features(audio_hash, self.audio, self.sampling_rate, self.frame_size, self.frame_step)
+        # only the thresholds are applied on every rerun
+        with profiling.stage("audio params"):
+            return get_audio_params(self.audio, 
+                                    self.sampling_rate, 
+                                    self.frame_size, 
+                                    self.frame_step, 
+                                    self.silence_vol_threshold, 
+                                    self.silence_zcr_threshold, 
+                                    self.voiced_vol_threshold, 
+                                    self.voiced_zcr_threshold,
+                                    self.yin_threshold,
+                                    features=features)
 
 
 if __name__ == "__main__":
@@ -1,36 +1,36 @@
-import pandas as pd
-
-def export_data(audio, sampling_rate, frame_size, frame_step, vol_threshold, params):
-
-        duration = len(audio) / sampling_rate
-
-        params_dict = {
-            "Frame": list(range(1, len(params) + 1))
-        }
-        
-        for param_key in ['ste', 'volume', 'zcr', 'silent_ratio', 'f0_autocorr', 'f0_amdf']:
-            params_dict[f"Param_{param_key}"] = [param[param_key] for param in params]
-
-        params_dict.update({
-            "Sampling Rate": [sampling_rate] * len(params),
-            "Frame Size": [frame_size] * len(params),
-            "Frame Step": [frame_step] * len(params),
-            "Volume Threshold": [vol_threshold] * len(params),
-            "Duration": [duration] * len(params),
-        })
-        
-        df = pd.DataFrame(params_dict)
-        csv_file = df.to_csv(index=False, sep=";")
-        
-        txt_data = f"Sampling Rate: {sampling_rate}\n"
-        txt_data += f"Frame Size: {frame_size}\n"
-        txt_data += f"Frame Step: {frame_step}\n"
-        txt_data += f"Volume Threshold: {vol_threshold}\n"
-        txt_data += f"Duration: {duration}\n"
-        
-        for idx in range(len(params)):
-            txt_data += f"\nFrame {idx+1}:\n"
-            for param_key in ['ste', 'volume', 'zcr', 'silent_ratio', 'f0_autocorr', 'f0_amdf']:
-                txt_data += f"  {param_key}: {params[idx][param_key]}\n"
-
-        return csv_file, txt_data
\ No newline at end of file
+import numpy as np
+from audio_core.columnar_io import export_bytes
+from audio_core.profiling import profiled
+
+PARAM_KEYS = ['ste', 'volume', 'zcr', 'silent_ratio', 'f0_autocorr', 'f0_amdf', 'f0_yin', 'yin_aperiodicity']
+
+def export_metadata(audio, sampling_rate, frame_size, frame_step, vol_threshold):
+    # written once per file, not repeated in every row
+    return {
+        "Sampling Rate": sampling_rate,
+        "Frame Size": frame_size,
+        "Frame Step": frame_step,
+        "Volume Threshold": vol_threshold,
+        "Duration": len(audio) / sampling_rate,
+    }
+
+
+def export_columns(params):
+    columns = {"Frame": np.arange(1, len(params) + 1)}
+
+    for param_key in PARAM_KEYS:
+        columns[f"Param_{param_key}"] = params[param_key]
+
+    return columns
+
+
+@profiled()
+def export_data(audio, sampling_rate, frame_size, frame_step, vol_threshold, params, fmt='csv'):
+    # returns the encoded file, fmt is one of audio_core.columnar_io.FORMATS
+    metadata = export_metadata(audio, sampling_rate, frame_size, frame_step, vol_threshold)
+
+    # TXT numbers the frames itself; long recordings give a ZIP of parts, see columnar_io.download_name
+    if fmt == 'txt':
+        return export_bytes("audio_params", {param_key: params[param_key] for param_key in PARAM_KEYS}, metadata, fmt)
+
+    return export_bytes("audio_params", export_columns(params), metadata, fmt)
@@ -1,16 +1,18 @@
-import numpy as np
 import plotly.graph_objects as go
+from audio_core.profiling import profiled
     
+@profiled()
 def draw_params_plot(audio, sampling_rate, selected_chart, fig, params):
     if audio is None:
         return
 
     if params is not None:
-        volume_data = [p['volume'] for p in params]
-        ste_data = [p['ste'] for p in params]
-        zcr_data = [p['zcr'] for p in params]
-        f0_autocorr_data = [p['f0_autocorr'] for p in params]
-        f0_amdf_data = [p['f0_amdf'] for p in params]
+        volume_data = params['volume']
+        ste_data = params['ste']
+        zcr_data = params['zcr']
+        f0_autocorr_data = params['f0_autocorr']
+        f0_amdf_data = params['f0_amdf']
+        f0_yin_data = params['f0_yin']
 
     if selected_chart == "Volume":
         data = volume_data
@@ -32,8 +34,12 @@ def draw_params_plot(audio, sampling_rate, selected_chart, fig, params):
         data = f0_amdf_data
         name = "F0 - AMDF"
         color = "orange"
+    elif selected_chart == "Fundamental Frequency (F0) - YIN":
+        data = f0_yin_data
+        name = "F0 - YIN"
+        color = "brown"
 
-    time = np.linspace(0, len(audio) / sampling_rate, len(data))
+    time = params['time']
 
     fig.add_trace(go.Scatter(x=time, y=data, mode='lines', name=name, line=dict(color=color)))
 
@@ -1,73 +1,55 @@
 import numpy as np
 import plotly.graph_objects as go
+from audio_core.waveform import WaveformPyramid
+from audio_core.profiling import profiled
 
-def draw_waveform_plot(audio, sampling_rate, fig, params, selected_wave_chart):
+@profiled()
+def draw_waveform_plot(audio, sampling_rate, fig, params, selected_wave_chart, pyramid=None):
     if audio is None:
         return
-    
-    time = np.linspace(0, len(audio) / sampling_rate, len(audio))
-    
+
+    # min/max envelope instead of every sample, the payload does not grow with the file
+    if pyramid is None:
+        pyramid = WaveformPyramid(audio, sampling_rate)
+    time, envelope = pyramid.envelope()
 
     if params is not None:
         
         if selected_wave_chart == "Silence":
-            selected_data = [p['silent_ratio'] for p in params]
+            selected_data = params['silent_ratio']
             legend_name = 'Silent Area'
             color = 'rgba(255, 0, 0, 0.2)'
             
         elif selected_wave_chart == "Voiced Phones":
-            selected_data = [p['voiced_ratio'] for p in params]
+            selected_data = params['voiced_ratio']
             legend_name = 'Voiced Phones'
             color = 'rgba(100, 255, 0, 0.2)'
             
-        frame_times = np.linspace(0, len(audio) / sampling_rate, len(selected_data))
-        legend_added = False
+        frame_times = params['time']
+
+        # one closed rectangle per run of flagged frames, all runs in a single
+        # trace separated by gaps; the last frame has no end time and is skipped
+        starts, ends = get_flag_runs(selected_data[:-1])
 
-        for i, data in enumerate(selected_data):
-            if data and i < len(frame_times) - 1:
-                if not legend_added:
-                    fig.add_trace(go.Scatter(
-                        x=[frame_times[i], frame_times[i + 1]],
-                        y=[np.min(audio), np.min(audio)],
-                        fill='tozeroy', 
-                        fillcolor=color,
-                        mode='none',
-                        name=legend_name,
-                        showlegend=True
-                    ))
-                    legend_added = True
-                else:
-                    fig.add_trace(go.Scatter(
-                        x=[frame_times[i], frame_times[i + 1]],
-                        y=[np.min(audio), np.min(audio)],
-                        fill='tozeroy', 
-                        fillcolor=color,
-                        mode='none',
-                        showlegend=False
-                    ))
-                    
-                if not legend_added:
-                    fig.add_trace(go.Scatter(
-                        x=[frame_times[i], frame_times[i + 1]],
-                        y=[np.max(audio), np.max(audio)],
-                        fill='tozeroy', 
-                        fillcolor=color,
-                        mode='none',
-                        name='Silent Area',
-                        showlegend=True
-                    ))
-                    legend_added = True
-                else:
-                    fig.add_trace(go.Scatter(
-                        x=[frame_times[i], frame_times[i + 1]],
-                        y=[np.max(audio), np.max(audio)],
-                        fill='tozeroy', 
-                        fillcolor=color,
-                        mode='none',
-                        showlegend=False
-                    ))
+        if len(starts) > 0:
+            x0 = frame_times[starts]
+            x1 = frame_times[ends]
+            y0 = np.full(len(starts), np.min(envelope))
+            y1 = np.full(len(starts), np.max(envelope))
+            gap = np.full(len(starts), np.nan)
 
-    fig.add_trace(go.Scatter(x=time, y=audio, mode='lines', name='Waveform', line=dict(color='#1f77b4')))
+            fig.add_trace(go.Scatter(
+                x=np.column_stack([x0, x1, x1, x0, x0, gap]).ravel(),
+                y=np.column_stack([y0, y0, y1, y1, y0, gap]).ravel(),
+                fill='toself',
+                fillcolor=color,
+                mode='none',
+                name=legend_name,
+                showlegend=True,
+                hoverinfo='skip'
+            ))
+
+    fig.add_trace(go.Scatter(x=time, y=envelope, mode='lines', name='Waveform', line=dict(color='#1f77b4')))
 
     fig.update_layout(
         title=dict(
@@ -100,38 +82,7 @@ def draw_waveform_plot(audio, sampling_rate, fig, params, selected_wave_chart):
         )
     )
     
-def draw_params_plot(audio, sampling_rate, selected_chart, fig, params):
-    if audio is None:
-        return
-
-    if params is not None:
-        volume_data = [p['volume'] for p in params]
-        ste_data = [p['ste'] for p in params]
-        zcr_data = [p['zcr'] for p in params]
-        f0_data = [p['f0'] for p in params]
-
-    if selected_chart == "Volume":
-        data = volume_data
-        name = "Volume"
-        color = "red"
-    elif selected_chart == "Short Time Energy (STE)":
-        data = ste_data
-        name = "STE"
-        color = "purple"
-    elif selected_chart == "Zero Crossing Rate (ZCR)":
-        data = zcr_data
-        name = "ZCR"
-        color = "green"
-    elif selected_chart == "Fundamental Frequency (F0)":
-        data = f0_data
-        name = "F0"
-        color = "blue"
-
-    time = np.linspace(0, len(audio) / sampling_rate, len(data))
-
-    fig.add_trace(go.Scatter(x=time, y=data, mode='lines', name=name, line=dict(color=color)))
-
-    fig.update_layout(title=dict(text=selected_chart,
-                      font=dict(size=30)),
-                      xaxis_title="Time [s]", 
-                      yaxis_title="Value")
\ No newline at end of file
+def get_flag_runs(flags):
+    # (start, end) frame indices of runs of True values, end exclusive
+    edges = np.diff(np.concatenate(([0], np.asarray(flags, dtype=np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)